@@ -0,0 +1,67 @@
+"""
+Shared helpers for the benchmark suite: percentiles and baseline files.
+"""
+import json
+import os
+from typing import Dict, List
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of ``samples`` (``fraction`` in 0..1).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def save_baseline(path: str, results: Dict[str, float]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+    print(f"Baseline saved to {path}")
+
+
+def compare_baseline(path: str, results: Dict[str, float], tolerance: float) -> bool:
+    """
+    Print each metric against the baseline and return False if any regressed
+    by more than ``tolerance``. Metrics ending in ``_per_s`` are higher-is-
+    better; every other metric is a latency.
+    """
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    ok = True
+    print(f"\n{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            print(f"{name:<48} {'-':>12} {current:>12.2f}")
+            continue
+        change = (current - previous) / previous
+        regressed = -change > tolerance if name.endswith("_per_s") else change > tolerance
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<48} {previous:>12.2f} {current:>12.2f} {change:>+8.1%}{flag}")
+        ok = ok and not regressed
+    return ok
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio (default 0.2)")
+
+
+def handle_baseline(args, results: Dict[str, float]) -> int:
+    """
+    Save or compare results as requested; returns the process exit code.
+    """
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+    if args.compare:
+        return 0 if compare_baseline(args.compare, results, args.tolerance) else 1
+    return 0
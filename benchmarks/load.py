@@ -0,0 +1,139 @@
+"""
+In-process load generator against the ASGI app.
+
+Requests go through ``httpx.AsyncClient`` with an ``ASGITransport`` (no
+network, no server), and NYT is replaced by a local stub with a fixed delay.
+Run with ``python -m benchmarks.load``; add ``--save-baseline PATH`` or
+``--compare PATH`` to track regressions.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from unittest.mock import patch
+
+import httpx
+
+from main import app
+from models.orders import Beer
+from services import orders_service
+from services.nyt_service import NYTService
+from benchmarks.common import add_baseline_arguments, handle_baseline, percentile
+
+GENRES = ["hardcover-fiction", "hardcover-nonfiction", "young-adult"]
+
+
+def nyt_stub(delay: float):
+    """
+    Async NYT stand-in answering list and genre calls after ``delay`` seconds.
+    """
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        if request.url.path.endswith("/lists/names.json"):
+            return httpx.Response(200, json={"results": [
+                {"list_name": genre, "list_name_encoded": genre} for genre in GENRES
+            ]})
+        genre = request.url.path.rsplit("/", 1)[-1].removesuffix(".json")
+        return httpx.Response(200, json={"results": {"books": [
+            {"book_uri": f"nyt://{genre}/{rank}", "rank": rank, "title": f"{genre} {rank}",
+             "author": f"Author {rank % 5}", "description": "x" * 200, "amazon_product_url": "https://amazon.com/x"}
+            for rank in range(1, 16)
+        ]}})
+    return httpx.MockTransport(handler)
+
+
+def scenario(tab_ids):
+    """
+    Weighted mix of requests: (name, method, url builder, json builder).
+    """
+    beers = ["Corona", "Quilmes", "Club Colombia"]
+    order = lambda: [  # noqa: E731
+        {"name": random.choice(beers), "quantity": 1, "user": f"Friend {random.randrange(6)}"}
+        for _ in range(random.randint(1, 3))
+    ]
+    return [
+        (30, "tab order", "POST", lambda: f"/beers/tabs/{random.choice(tab_ids)}/order", order),
+        (20, "tab bill", "GET", lambda: f"/beers/tabs/{random.choice(tab_ids)}/bill", None),
+        (15, "stock", "GET", lambda: "/beers/stock", None),
+        (15, "books", "GET", lambda: f"/nyt/books?genre={random.choice(GENRES)}&limit=15", None),
+        (10, "genres", "GET", lambda: "/nyt/genres", None),
+        (10, "tab friends", "GET", lambda: f"/beers/tabs/{random.choice(tab_ids)}/bill/friends", None),
+    ]
+
+
+async def run(requests: int, concurrency: int, tabs: int, nyt_delay: float):
+    orders_service.stock.beers = [
+        Beer(name="Corona", price=115, quantity=10**9),
+        Beer(name="Quilmes", price=120, quantity=10**9),
+        Beer(name="Club Colombia", price=110, quantity=10**9),
+    ]
+    orders_service.stock.last_updated = datetime.now()
+    orders_service.tabs.tabs.clear()
+    tab_ids = [orders_service.tabs.create().tab_id for _ in range(tabs)]
+    NYTService().reset_books()
+    NYTService().reset_genres()
+
+    stub = httpx.AsyncClient(base_url=NYTService.BASE_URL, transport=nyt_stub(nyt_delay))
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    mix = scenario(tab_ids)
+    weights = [weight for weight, *_ in mix]
+    remaining = iter(range(requests))
+
+    with patch.object(NYTService, "async_client", stub):
+        for genre in GENRES:
+            await NYTService().afetch_books(genre)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                for _ in remaining:
+                    _, name, method, url, body = random.choices(mix, weights)[0]
+                    start = time.perf_counter()
+                    response = await client.request(method, url(), json=body() if body else None)
+                    latencies[name].append(time.perf_counter() - start)
+                    if response.status_code >= 400:
+                        errors[name] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def report(latencies, errors, elapsed):
+    results = {}
+    everything = [sample for samples in latencies.values() for sample in samples]
+    print(f"{'endpoint':<14} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, samples in sorted(latencies.items()) + [("all", everything)]:
+        p50, p95, p99 = (percentile(samples, q) * 1000 for q in (0.5, 0.95, 0.99))
+        failed = sum(errors.values()) if name == "all" else errors[name]
+        print(f"{name:<14} {len(samples):>9} {failed:>7} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+        key = name.replace(" ", "_")
+        results.update({f"load.{key}.p50_ms": p50, f"load.{key}.p95_ms": p95, f"load.{key}.p99_ms": p99})
+    throughput = len(everything) / elapsed
+    print(f"\nthroughput: {throughput:.0f} requests/s over {elapsed:.2f}s")
+    results["load.throughput_per_s"] = throughput
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tabs", type=int, default=100)
+    parser.add_argument("--nyt-delay", type=float, default=0.05, help="stub NYT latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    results = report(*asyncio.run(run(args.requests, args.concurrency, args.tabs, args.nyt_delay)))
+    return handle_baseline(args, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
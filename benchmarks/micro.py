@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks of the order hot paths at growing rounds, friends and SKUs.
+
+Run with ``python -m benchmarks.micro``; add ``--save-baseline PATH`` or
+``--compare PATH`` to track regressions. Timings are microseconds per call.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from models.orders import Beer, OrderRequest, PayRequest
+from services import orders_service
+from benchmarks.common import add_baseline_arguments, handle_baseline
+
+SCALES = [
+    # (rounds already on the tab, friends, SKUs)
+    (10, 2, 3),
+    (100, 10, 100),
+    (1_000, 50, 1_000),
+    (5_000, 200, 10_000),
+]
+CALLS = 200
+
+
+def prepare(rounds: int, friend_count: int, skus: int):
+    """
+    Reset the default tab and fill it with ``rounds`` rounds.
+    """
+    orders_service.stock.beers = [
+        Beer(name=f"Beer {i}", price=100 + i % 50, quantity=10**9) for i in range(skus)
+    ]
+    orders_service.stock.last_updated = datetime.now()
+    orders_service.current_order.items = []
+    orders_service.current_order.rounds = []
+    orders_service.current_order.paid = False
+    orders_service.friends.clear()
+    for i in range(rounds):
+        orders_service.update_stock_and_order(round_for(i, friend_count, skus))
+
+
+def round_for(i: int, friend_count: int, skus: int):
+    return [
+        OrderRequest(name=f"Beer {(i * 7 + line) % skus}", quantity=1 + line, user=f"Friend {(i + line) % friend_count}")
+        for line in range(3)
+    ]
+
+
+def timed(function, calls: int = CALLS) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        function(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench(rounds: int, friend_count: int, skus: int):
+    prepare(rounds, friend_count, skus)
+    results = {
+        "update_stock_and_order": timed(
+            lambda i: orders_service.update_stock_and_order(round_for(rounds + i, friend_count, skus))
+        ),
+        "calculate_order_totals": timed(lambda i: orders_service.calculate_order_totals()),
+        "calculate_individual_due": timed(
+            lambda i: orders_service.calculate_individual_due(f"Friend {i % friend_count}")
+        ),
+    }
+
+    # finalize_payment after an individual payment, one friend per call.
+    payments = min(CALLS, friend_count)
+    start = time.perf_counter()
+    for i in range(payments):
+        orders_service.pay_bill(PayRequest(mode="individual", friend=f"Friend {i}"))
+    results["pay_individual+finalize_payment"] = (time.perf_counter() - start) / payments * 1e6
+    results["finalize_payment"] = timed(lambda i: orders_service.finalize_payment())
+    orders_service.current_order.paid_mode = orders_service.PaidModeEnum.unknown
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    flat = {}
+    print(f"{'rounds':>7} {'friends':>8} {'SKUs':>7}  {'function':<34} {'us/call':>10}")
+    for rounds, friend_count, skus in SCALES:
+        for name, micros in bench(rounds, friend_count, skus).items():
+            print(f"{rounds:>7} {friend_count:>8} {skus:>7}  {name:<34} {micros:>10.1f}")
+            flat[f"micro.{name}.r{rounds}_f{friend_count}_s{skus}_us"] = micros
+    return handle_baseline(args, flat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+What exact bill splits cost: the previous float split, one friend at a
+time, against the integer-cent money engine.
+
+The cents split is about as fast as the float loop, not faster: it is
+there because its shares add up to the bill, which the float ones often
+do not. Rejected is how often a float equal split adds up to more than the
+bill and was refused.
+
+Run with ``python -m benchmarks.money``; add ``--save-baseline PATH`` or
+``--compare PATH`` to track regressions. Timings are microseconds per split.
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.common import add_baseline_arguments, handle_baseline
+from services.money import apply_rate, split_bill, split_equal, to_cents
+
+GROUP_SIZES = [2, 10, 100, 1_000, 10_000]
+SPLITS = 50
+TAX_RATE = 0.19
+DISCOUNT_RATE = 0.10
+
+
+def random_group(rng: random.Random, size: int):
+    return {f"Friend {i}": rng.randint(1, 40) * 5 + 100 for i in range(size)}
+
+
+def float_split(consumption):
+    """
+    The previous approach: each friend's share from the rates, in floats.
+    """
+    subtotal = sum(consumption.values())
+    taxes = round(subtotal * TAX_RATE, 2)
+    discounts = round(subtotal * DISCOUNT_RATE, 2)
+    total = round(subtotal + taxes - discounts, 2)
+    shares = {}
+    for name, spent in consumption.items():
+        shares[name] = round(spent + spent * TAX_RATE - spent * discounts / subtotal, 2)
+    return total, shares
+
+
+def cents_split(consumption):
+    subtotal = to_cents(sum(consumption.values()))
+    taxes = apply_rate(subtotal, TAX_RATE)
+    discounts = apply_rate(subtotal, DISCOUNT_RATE)
+    shares = split_bill({name: to_cents(spent) for name, spent in consumption.items()}, taxes, discounts)
+    return subtotal + taxes - discounts, shares
+
+
+def bench(size: int, rng: random.Random):
+    groups = [random_group(rng, size) for _ in range(SPLITS)]
+
+    start = time.perf_counter()
+    for group in groups:
+        float_split(group)
+    float_us = (time.perf_counter() - start) / SPLITS * 1e6
+
+    start = time.perf_counter()
+    splits = [cents_split(group) for group in groups]
+    cents_us = (time.perf_counter() - start) / SPLITS * 1e6
+    for total, shares in splits:
+        assert sum(share["total"] for share in shares.values()) == total
+
+    # Equal splits: how often round(total / n, 2) * n overshoots the bill.
+    rejected = 0
+    for group in groups:
+        total, _ = float_split(group)
+        share = round(total / size, 2)
+        rejected += share * size > total
+    totals = [cents_split(group)[0] for group in groups]
+    start = time.perf_counter()
+    for total in totals:
+        split_equal(total, size)
+    equal_us = (time.perf_counter() - start) / SPLITS * 1e6
+
+    return {
+        "float_split": float_us,
+        "cents_split": cents_us,
+        "float_equal_rejections": rejected / SPLITS,
+        "cents_equal_split": equal_us,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=7)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    flat = {}
+    print(f"{'friends':>8} {'float (us)':>11} {'cents (us)':>11} {'rejected':>9} {'equal (us)':>11}")
+    for size in GROUP_SIZES:
+        result = bench(size, rng)
+        print(
+            f"{size:>8} {result['float_split']:>11.1f} {result['cents_split']:>11.1f}"
+            f" {result['float_equal_rejections']:>9.0%}"
+            f" {result['cents_equal_split']:>11.1f}"
+        )
+        flat[f"money.cents_split.f{size}_us"] = result["cents_split"]
+        flat[f"money.cents_equal_split.f{size}_us"] = result["cents_equal_split"]
+    return handle_baseline(args, flat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Order placement and due calculation against growing stock catalogs.
+
+Run with ``python -m benchmarks.stock_index``. Per-call timings should stay
+flat as the catalog grows from 3 to 10k SKUs.
+"""
+import time
+from datetime import datetime
+
+from models.orders import Beer, OrderRequest
+from services import orders_service
+
+CATALOG_SIZES = [3, 100, 1_000, 10_000]
+ORDERS = 200
+
+
+def reset(catalog_size: int):
+    orders_service.stock.beers = [
+        Beer(name=f"Beer {i}", price=100 + i % 50, quantity=10**9) for i in range(catalog_size)
+    ]
+    orders_service.stock.last_updated = datetime.now()
+    orders_service.current_order.items = []
+    orders_service.current_order.rounds = []
+    orders_service.friends.clear()
+
+
+def bench(catalog_size: int):
+    reset(catalog_size)
+    # Order the last SKUs, the worst case for a linear scan.
+    names = [f"Beer {catalog_size - 1 - i % min(catalog_size, 3)}" for i in range(3)]
+    order = [OrderRequest(name=name, quantity=1, user=f"Friend {i}") for i, name in enumerate(names)]
+
+    start = time.perf_counter()
+    for _ in range(ORDERS):
+        orders_service.update_stock_and_order(order)
+    order_us = (time.perf_counter() - start) / ORDERS * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ORDERS):
+        orders_service.calculate_individual_due("Friend 0")
+    due_us = (time.perf_counter() - start) / ORDERS * 1e6
+    return order_us, due_us
+
+
+def main():
+    print(f"{'SKUs':>8} {'order (us)':>12} {'due (us)':>12}")
+    for size in CATALOG_SIZES:
+        order_us, due_us = bench(size)
+        print(f"{size:>8} {order_us:>12.1f} {due_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
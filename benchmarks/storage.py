@@ -0,0 +1,62 @@
+"""
+Order throughput of the in-memory and SQLite storage backends.
+
+Run with ``python -m benchmarks.storage``. Each backend places the same
+rounds through ``update_stock_and_order`` and settles half of the tabs
+with individual payments.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from models.orders import Beer, OrderRequest, PayRequest
+from services import orders_service
+from services.storage import InMemoryStorage, SQLiteStorage
+
+ROUNDS = 2_000
+TABS = 50
+
+
+def reset():
+    orders_service.stock.beers = [
+        Beer(name=f"Beer {i}", price=100 + i, quantity=10**9) for i in range(20)
+    ]
+    orders_service.stock.last_updated = datetime.now()
+    orders_service.tabs.tabs.clear()
+
+
+def run(storage):
+    with patch.object(orders_service, "storage", storage):
+        tabs = [orders_service.tabs.create() for _ in range(TABS)]
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            orders_service.update_stock_and_order([
+                OrderRequest(name=f"Beer {i % 20}", quantity=1, user=f"Friend {i % 4}"),
+                OrderRequest(name=f"Beer {(i + 7) % 20}", quantity=2, user=f"Friend {i % 3}"),
+            ], tabs[i % TABS])
+        for tab in tabs[::2]:
+            for name in list(tab.friends):
+                orders_service.pay_bill(PayRequest(mode="individual", friend=name), tab)
+        return time.perf_counter() - start
+
+
+def main():
+    results = {}
+    reset()
+    results["memory"] = run(InMemoryStorage(orders_service.stock_index))
+
+    with tempfile.TemporaryDirectory() as directory:
+        reset()
+        storage = SQLiteStorage(orders_service.stock_index, os.path.join(directory, "bench.db"))
+        results["sqlite"] = run(storage)
+        storage.close()
+
+    print(f"{'backend':<20} {'orders/s':>10}")
+    for name, elapsed in results.items():
+        print(f"{name:<20} {ROUNDS / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,68 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from routers import orders, nyt
+from services import metrics, orders_service
+from services.logs import log_message, request_id_var
+from services.nyt_service import NYTService
+from tasks.fetch_queue import fetch_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    orders_service.restore()
+    sync_task = asyncio.create_task(orders_service.sync_periodically()) if orders_service.storage.durable else None
+    await NYTService.startup()
+    await fetch_queue.start()
+    yield
+    if sync_task is not None:
+        sync_task.cancel()
+        await asyncio.gather(sync_task, return_exceptions=True)
+    await fetch_queue.stop()
+    fetch_queue.close()
+    await NYTService.shutdown()
+    orders_service.snapshot_all()
+    orders_service.storage.close()
+
+
+app = FastAPI(title="Cometa Test API", version="1.0", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    status = 500
+    metrics.http_requests_in_flight.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.http_requests_in_flight.dec()
+        route = request.scope.get("route")
+        # Label by route template so path parameters don't explode cardinality.
+        route_path = route.path if route is not None else "unmatched"
+        metrics.http_requests_total.inc(method=request.method, route=route_path, status=status)
+        metrics.http_request_duration_seconds.observe(elapsed, method=request.method, route=route_path)
+        log_message(
+            "%s %s %d",
+            request.method,
+            request.url.path,
+            status,
+            method=request.method,
+            path=request.url.path,
+            status=status,
+            latency_ms=round(elapsed * 1000, 3),
+        )
+        request_id_var.reset(token)
 
-app = FastAPI(title="Cometa Test API", version="1.0")
 
 # Registrar los routers
 app.include_router(orders.router, prefix="/beers", tags=["Beers Orders"])
@@ -10,3 +71,11 @@ app.include_router(nyt.router, prefix="/nyt", tags=["NYT Integration"])
 @app.get("/")
 def root():
     return {"message": "Welcome to Cometa Test API"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint():
+    """
+    Prometheus metrics of requests, NYT calls and background tasks.
+    """
+    return PlainTextResponse(metrics.expose(), media_type="text/plain; version=0.0.4")
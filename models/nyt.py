@@ -1,7 +1,10 @@
 from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
 
 class NYTBookFilter(BaseModel):
     genre: str
+    priority: int = 0
 
 class BookResponse(BaseModel):
     book_uri: str
@@ -10,7 +13,7 @@ class BookResponse(BaseModel):
     author: str
     description: str
     amazon_url: str
-
+    genre: Optional[str] = None
 
     def __hash__(self):
         return hash((self.book_uri))
@@ -19,3 +22,30 @@ class BookResponse(BaseModel):
         if isinstance(other, BookResponse):
             return (self.book_uri) == (other.book_uri)
         return False
+
+class BulkBookFilter(BaseModel):
+    genres: List[str] = []
+    all_genres: bool = False
+    priority: int = 0
+
+class PrefetchJobStatus(BaseModel):
+    job_id: str
+    state: str
+    total: int
+    completed: List[str] = []
+    failed: Dict[str, str] = {}
+    jobs: Dict[str, str] = {}
+    created: datetime
+    finished: Optional[datetime] = None
+
+class FetchJobStatus(BaseModel):
+    job_id: str
+    genre: str
+    priority: int = 0
+    state: str
+    attempts: int = 0
+    books: Optional[int] = None
+    error: Optional[str] = None
+    created: datetime
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
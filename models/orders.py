@@ -47,6 +47,7 @@ class Order(BaseModel):
 class StockItem(BaseModel):
     name: str
     quantity: int
+    price: Optional[int] = None
 
 class StockRequest(BaseModel):
     items: List[StockItem]
@@ -70,3 +71,75 @@ class PayRequest(BaseModel):
             raise ValueError('friend is required when mode is individual')
         return v
 
+
+class FriendShare(BaseModel):
+    name: str
+    consumption: float
+    taxes: float
+    discounts: float
+    total: float
+    paid: float
+    due: float
+
+class TabRequest(BaseModel):
+    tab_id: Optional[str] = None
+
+class TabSummary(BaseModel):
+    tab_id: str
+    created: datetime
+    paid: bool
+    total: float
+    friends: int
+    rounds: int
+
+class RoundRequest(BaseModel):
+    items: List[OrderRequest]
+    created: Optional[datetime] = None
+
+class BatchOrderRequest(BaseModel):
+    rounds: List[RoundRequest]
+
+class RoundResult(BaseModel):
+    index: int
+    created: datetime
+    items: int
+    subtotal: int
+
+class PricingKindEnum(str, Enum):
+    tax = 'tax'
+    volume = 'volume'
+    promo = 'promo'
+    happy_hour = 'happy_hour'
+
+class PricingRule(BaseModel):
+    kind: PricingKindEnum
+    name: str
+    rate: float
+    # volume: total beers in the order; promo: units of ``beer``.
+    min_quantity: int = 0
+    beer: Optional[str] = None
+    # happy_hour: "HH:MM" window, crossing midnight if end < start, and
+    # weekdays (0 is Monday); every day when empty.
+    start: Optional[str] = None
+    end: Optional[str] = None
+    days: List[int] = []
+
+class PricingPlanSummary(BaseModel):
+    version: str
+    tax_rate: float
+    rules: List[PricingRule]
+
+class PriceAdjustment(BaseModel):
+    rule: str
+    kind: PricingKindEnum
+    amount: float
+
+class TabPricing(BaseModel):
+    tab_id: str
+    plan_version: str
+    subtotal: float
+    taxes: float
+    discounts: float
+    total: float
+    adjustments: List[PriceAdjustment]
+    evaluations: int
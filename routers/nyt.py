@@ -1,33 +1,129 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from models.nyt import NYTBookFilter
+import os
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from models.nyt import BulkBookFilter, NYTBookFilter
+from services.log_reader import LogFilter, make_cursor, read_forward, read_tail, resolve_cursor, stream_ndjson
+from services.logs import LOG_FILE
 from services.nyt_service import NYTService
-from tasks.background_tasks import fetch_books_with_retry
+from services.serialization import json_response
+from services.versioning import books_version, conditional_response
+from tasks.bulk_prefetch import create_prefetch_job, get_prefetch_job
+from tasks.fetch_queue import fetch_queue
 
 router = APIRouter()
 
 nyt_service = NYTService()
 
 @router.post("/books")
-def get_books(filter: NYTBookFilter, background_tasks: BackgroundTasks):
+async def get_books(filter: NYTBookFilter):
     """
     Endpoint to search for books by genre in the NYT.
     """
-    
-    try:
-        background_tasks.add_task(fetch_books_with_retry, filter.genre)
-        return {"message": "Fetching books in the background"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching books: {str(e)}")
+    job, created = await fetch_queue.enqueue(filter.genre, filter.priority)
+    return {
+        "message": "Fetching books in the background" if created else "Books for this genre are already being fetched",
+        "job_id": job.job_id,
+        "state": job.state,
+    }
+
+@router.post("/books/bulk", status_code=202)
+async def prefetch_books(filter: BulkBookFilter):
+    """
+    Endpoint to prefetch many genres (or every NYT genre) on the fetch queue.
+    """
+    genres = list(dict.fromkeys(filter.genres))
+    if filter.all_genres:
+        try:
+            listed = await nyt_service.get_genres()
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Error fetching genres: {str(e)}")
+        genres = [genre.get("list_name_encoded") for genre in listed if genre.get("list_name_encoded")]
+    if not genres:
+        raise HTTPException(status_code=400, detail="Provide genres or set all_genres.")
+
+    fetch_jobs = {}
+    for genre in genres:
+        fetch_job, _ = await fetch_queue.enqueue(genre, filter.priority)
+        fetch_jobs[genre] = fetch_job.job_id
+    job = create_prefetch_job(fetch_jobs)
+    return {
+        "message": "Prefetching books in the background",
+        "job_id": job.job_id,
+        "total": job.total,
+        "jobs": fetch_jobs,
+    }
+
+
+@router.get("/books/jobs")
+def list_fetch_jobs(state: Optional[str] = None):
+    """
+    Returns the fetch jobs, optionally filtered by state.
+    """
+    return {"jobs": fetch_queue.list(state)}
+
+
+@router.get("/books/jobs/{job_id}")
+def fetch_job_status(job_id: str):
+    """
+    Returns the status of a fetch job.
+    """
+    job = fetch_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/books/bulk/{job_id}")
+def prefetch_status(job_id: str):
+    """
+    Returns the progress of a prefetch job.
+    """
+    job = get_prefetch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return fetch_queue.progress(job)
+
 
 @router.get("/books")
-def view_cached_books():
+def view_cached_books(
+    request: Request,
+    response: Response,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+):
     """
-    Returns the books stored.
+    Returns the books stored, optionally filtered by genre or author and
+    paginated with limit and cursor.
     """
-    books = nyt_service.get_cached_books()
+    not_modified = conditional_response(request, response, books_version)
+    if not_modified:
+        return not_modified
+
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+    books, next_offset = nyt_service.query_books(genre=genre, author=author, limit=limit, offset=offset)
     if not books:
         return {"message": "No books found"}
-    return {"books": books}
+    return json_response({
+        "books": books,
+        "next_cursor": str(next_offset) if next_offset is not None else None,
+    }, response)
+
+@router.get("/books/stats")
+def cached_books_stats():
+    """
+    Returns the size of the books stored in memory.
+    """
+    return nyt_service.books_footprint()
 
 @router.delete("/books/reset")
 def reset_cached_books():
@@ -39,24 +135,56 @@ def reset_cached_books():
 
 
 @router.get("/logs")
-def get_logs():
+def get_logs(
+    limit: int = Query(100, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    before: Optional[int] = Query(None, ge=0),
+    level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
     """
     Returns the logs of the application.
+
+    By default the last `limit` lines are returned. `cursor` reads forward
+    from a position returned by an earlier call (use the returned `cursor`
+    to follow new lines) and `before` pages backwards. A cursor into a log
+    file that was rotated or truncated since reads the new file from its
+    start, and the response has `reset` set. `level` keeps lines at or above
+    that level, `since`/`until` bound their time, and `format=ndjson`
+    streams the lines.
     """
-    try:
-        with open("execution.log", "r") as log_file:
-            logs = log_file.readlines()
-        return {"logs": logs}
-    except FileNotFoundError:
+    if not os.path.exists(LOG_FILE):
         return {"logs": "No logs found"}
+    try:
+        log_filter = LogFilter(level, since, until)
+        offset, reset = resolve_cursor(LOG_FILE, cursor) if cursor is not None else (None, False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        if offset is None:
+            _, offset, _ = read_tail(LOG_FILE, limit, log_filter, before)
+        return StreamingResponse(
+            stream_ndjson(LOG_FILE, offset, log_filter, limit), media_type="application/x-ndjson"
+        )
+
+    if offset is not None:
+        logs, next_offset = read_forward(LOG_FILE, offset, limit, log_filter)
+        return {"logs": logs, "cursor": make_cursor(LOG_FILE, next_offset), "reset": reset}
+
+    logs, first, last = read_tail(LOG_FILE, limit, log_filter, before)
+    return {"logs": logs, "cursor": make_cursor(LOG_FILE, last), "before": first if first > 0 else None}
+
 
 @router.get("/genres")
-def fetch_genres_endpoint():
+async def fetch_genres_endpoint():
     """
     Fetch the genres available from NYT.
     """
     try:
-        genres = nyt_service.fetch_genres()
+        genres = await nyt_service.get_genres()
         return {"message": "Genres fetched successfully", "genres": genres}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching genres: {str(e)}")
\ No newline at end of file
@@ -1,15 +1,91 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from services.orders_service import (
     fill_stock,
+    sync,
     update_stock_and_order,
+    apply_rounds,
     pay_bill,
+    friend_shares,
+    open_tab as open_order_tab,
+    close_tab as close_order_tab,
+    tab_history,
+    tab_pricing,
+    tab_topic,
+    bill_state,
+    stock_state,
     stock,
-    current_order,
+    default_tab,
+    tabs,
 )
-from models.orders import StockRequest, OrderRequest, PayRequest
+from models.orders import BatchOrderRequest, StockRequest, OrderRequest, PayRequest, TabRequest
+from services.idempotency import fingerprint, idempotency_cache
+from services.pricing import pricing_engine
+from services.push import broadcaster, encode, sse_stream
+from services.serialization import json_response, order_view
+from services.versioning import conditional_response, order_version, stock_version
 
-router = APIRouter()
+# Every route first applies what other workers journaled, so any worker can
+# serve any tab.
+router = APIRouter(dependencies=[Depends(sync)])
+
+# `?view=summary` leaves the round history out of order payloads.
+View = Query("full", pattern="^(full|summary)$")
+IdempotencyKey = Header(None, alias="Idempotency-Key")
+
+
+def idempotent(key: Optional[str], scope: str, payload, handler):
+    """
+    Run a state-changing handler once per Idempotency-Key, if one was sent.
+    """
+    if key is None:
+        return handler()
+    return idempotency_cache.execute(f"{scope}:{key}", fingerprint(payload), handler)
+
+
+def tab_view(tab, view: str):
+    return order_view(tab.order, view, tab.round_count)
+
+
+def payment_view(result: dict, view: str, tab) -> dict:
+    result["order"] = tab_view(tab, view)
+    return result
+
+
+async def event_stream(tab, stock_updates: bool) -> StreamingResponse:
+    topics = [tab_topic(tab)] + (["stock"] if stock_updates else [])
+    # Subscribe before reading the state, so no change falls in between.
+    subscription = broadcaster.subscribe(topics)
+    try:
+        # bill_state waits for the tab's lock, which must not block the loop.
+        initial = [encode("bill", await run_in_threadpool(bill_state, tab))]
+    except BaseException:
+        broadcaster.unsubscribe(subscription)
+        raise
+    if stock_updates:
+        initial.append(encode("stock", stock_state()))
+    return StreamingResponse(
+        sse_stream(subscription, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def batch_result(results, tab) -> dict:
+    order = tab.order
+    return {
+        "message": f"{len(results)} rounds placed",
+        "rounds": results,
+        "totals": {
+            "subtotal": order.subtotal,
+            "taxes": order.taxes,
+            "discounts": order.discounts,
+            "total": order.total,
+            "round_count": tab.round_count,
+        },
+    }
 
 
 @router.post("/fill-stock")
@@ -18,47 +94,262 @@ def fill_stock_endpoint(stock_request: StockRequest):
     Endpoint to fill the stock with new items.
     """
     fill_stock(stock_request)
-    return {"message": "Stock filled successfully", "stock": stock}
+    return json_response({"message": "Stock filled successfully", "stock": stock})
 
 
 @router.get("/stock")
-def list_beers():
+def list_beers(request: Request, response: Response):
     """
     Endpoint to list all available beers in stock.
     """
-    return stock
+    not_modified = conditional_response(request, response, stock_version)
+    if not_modified:
+        return not_modified
+    return json_response(stock, response)
 
 
 @router.post("/order")
-def place_order(order_request: List[OrderRequest]):
+def place_order(order_request: List[OrderRequest], view: str = View, idempotency_key: Optional[str] = IdempotencyKey):
     """
     Endpoint to place an order for beers.
     """
-    try:
-        update_stock_and_order(order_request)
-        return {"message": "Order placed", "order": current_order}
-    except HTTPException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    def handler():
+        try:
+            update_stock_and_order(order_request)
+            return json_response({"message": "Order placed", "order": tab_view(default_tab, view)})
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, "order", (order_request, view), handler)
+
+
+@router.post("/order/batch")
+def place_order_batch(batch_request: BatchOrderRequest, idempotency_key: Optional[str] = IdempotencyKey):
+    """
+    Endpoint to place many rounds at once, all or none of them.
+    """
+    def handler():
+        try:
+            results = apply_rounds(batch_request.rounds)
+            return json_response(batch_result(results, default_tab))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, "order/batch", batch_request, handler)
 
 
 @router.get("/bill")
-def get_bill():
+def get_bill(request: Request, response: Response, view: str = View):
     """
     Endpoint to retrieve the current bill.
     """
-    return current_order
+    not_modified = conditional_response(request, response, order_version)
+    if not_modified:
+        return not_modified
+    return json_response(tab_view(default_tab, view), response)
+
+
+@router.get("/bill/friends")
+def get_bill_by_friend(request: Request, response: Response):
+    """
+    Endpoint to retrieve what each friend consumed, owes and has paid.
+    """
+    not_modified = conditional_response(request, response, order_version)
+    if not_modified:
+        return not_modified
+    return json_response({"friends": friend_shares()}, response)
+
+
+@router.get("/history")
+def get_history():
+    """
+    Endpoint to retrieve every round and payment journaled for the order.
+    """
+    return json_response({"events": tab_history()})
+
+
+@router.get("/pricing/plan")
+def get_pricing_plan():
+    """
+    Endpoint to inspect the compiled pricing rules.
+    """
+    return json_response(pricing_engine.plan.summary())
+
+
+@router.get("/pricing")
+def get_pricing():
+    """
+    Endpoint to see how the pricing rules price the order.
+    """
+    return json_response(tab_pricing())
+
+
+@router.get("/stream")
+async def stream_changes(stock_updates: bool = Query(True, alias="stock")):
+    """
+    Endpoint to receive bill (and stock) changes as Server-Sent Events.
+    """
+    return await event_stream(default_tab, stock_updates)
 
 
 @router.put("/pay")
-def pay_order(pay_request: PayRequest):
+def pay_order(pay_request: PayRequest, view: str = View, idempotency_key: Optional[str] = IdempotencyKey):
     """
     Endpoint to process a payment for the order.
     """
-    try:
-        return pay_bill(pay_request)
-    except HTTPException as e:
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    def handler():
+        try:
+            return json_response(payment_view(pay_bill(pay_request), view, default_tab))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, "pay", (pay_request, view), handler)
+
+
+# Tabs
+@router.post("/tabs", status_code=201)
+def open_tab(tab_request: Optional[TabRequest] = None):
+    """
+    Endpoint to open a new tab.
+    """
+    tab = open_order_tab(tab_request.tab_id if tab_request else None)
+    return json_response(tab.summary(), status_code=201)
+
+
+@router.get("/tabs")
+def list_tabs():
+    """
+    Endpoint to list the open tabs.
+    """
+    return json_response({"tabs": tabs.list()})
+
+
+@router.get("/tabs/{tab_id}")
+def get_tab(tab_id: str, view: str = View):
+    """
+    Endpoint to retrieve a tab and its order.
+    """
+    tab = tabs.get(tab_id)
+    return json_response({"tab": tab.summary(), "order": tab_view(tab, view)})
+
+
+@router.delete("/tabs/{tab_id}")
+def close_tab(tab_id: str, force: bool = False):
+    """
+    Endpoint to close a tab. Unpaid tabs need force=true.
+    """
+    tab = close_order_tab(tab_id, force=force)
+    return json_response({"message": f"Tab {tab_id} closed", "tab": tab.summary()})
+
+
+@router.post("/tabs/{tab_id}/order")
+def place_tab_order(
+    tab_id: str, order_request: List[OrderRequest], view: str = View, idempotency_key: Optional[str] = IdempotencyKey
+):
+    """
+    Endpoint to place an order for beers on a tab.
+    """
+    tab = tabs.get(tab_id)
+
+    def handler():
+        try:
+            update_stock_and_order(order_request, tab)
+            return json_response({"message": "Order placed", "order": tab_view(tab, view)})
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, f"tabs/{tab_id}/order", (order_request, view), handler)
+
+
+@router.post("/tabs/{tab_id}/order/batch")
+def place_tab_order_batch(tab_id: str, batch_request: BatchOrderRequest, idempotency_key: Optional[str] = IdempotencyKey):
+    """
+    Endpoint to place many rounds on a tab at once, all or none of them.
+    """
+    tab = tabs.get(tab_id)
+
+    def handler():
+        try:
+            results = apply_rounds(batch_request.rounds, tab)
+            return json_response(batch_result(results, tab))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, f"tabs/{tab_id}/order/batch", batch_request, handler)
+
+
+@router.get("/tabs/{tab_id}/bill")
+def get_tab_bill(tab_id: str, request: Request, response: Response, view: str = View):
+    """
+    Endpoint to retrieve the bill of a tab.
+    """
+    tab = tabs.get(tab_id)
+    not_modified = conditional_response(request, response, tab.version)
+    if not_modified:
+        return not_modified
+    return json_response(tab_view(tab, view), response)
+
+
+@router.get("/tabs/{tab_id}/bill/friends")
+def get_tab_bill_by_friend(tab_id: str, request: Request, response: Response):
+    """
+    Endpoint to retrieve what each friend of a tab consumed, owes and has paid.
+    """
+    tab = tabs.get(tab_id)
+    not_modified = conditional_response(request, response, tab.version)
+    if not_modified:
+        return not_modified
+    return json_response({"friends": friend_shares(tab)}, response)
+
+
+@router.get("/tabs/{tab_id}/history")
+def get_tab_history(tab_id: str):
+    """
+    Endpoint to retrieve every round and payment journaled for a tab, even
+    after it was closed.
+    """
+    return json_response({"events": tab_history(tab_id)})
+
+
+@router.get("/tabs/{tab_id}/pricing")
+def get_tab_pricing(tab_id: str):
+    """
+    Endpoint to see how the pricing rules price a tab.
+    """
+    return json_response(tab_pricing(tabs.get(tab_id)))
+
+
+@router.get("/tabs/{tab_id}/stream")
+async def stream_tab_changes(tab_id: str, stock_updates: bool = Query(True, alias="stock")):
+    """
+    Endpoint to receive the bill (and stock) changes of a tab as Server-Sent Events.
+    """
+    return await event_stream(tabs.get(tab_id), stock_updates)
+
+
+@router.put("/tabs/{tab_id}/pay")
+def pay_tab(tab_id: str, pay_request: PayRequest, view: str = View, idempotency_key: Optional[str] = IdempotencyKey):
+    """
+    Endpoint to process a payment for a tab.
+    """
+    tab = tabs.get(tab_id)
+
+    def handler():
+        try:
+            return json_response(payment_view(pay_bill(pay_request, tab), view, tab))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return idempotent(idempotency_key, f"tabs/{tab_id}/pay", (pay_request, view), handler)
@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class BookDiskCache:
+    """
+    On-disk cache of NYT lists keyed by genre and ``published_date``.
+
+    Entries are compact JSON blobs in SQLite (WAL mode, so every worker on
+    the host can share the file). Each entry has its own expiry, and the
+    least recently used entries are evicted once the cache holds more than
+    ``max_entries`` lists or ``max_bytes`` of payload.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS lists ("
+        " genre TEXT NOT NULL, published_date TEXT NOT NULL, payload BLOB NOT NULL,"
+        " size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL,"
+        " PRIMARY KEY (genre, published_date))",
+        "CREATE INDEX IF NOT EXISTS lists_last_access ON lists (last_access)",
+    )
+    UPSERT = (
+        "INSERT OR REPLACE INTO lists (genre, published_date, payload, size, expires_at, last_access)"
+        " VALUES (?, ?, ?, ?, ?, ?)"
+    )
+    SELECT_LATEST = (
+        "SELECT published_date, payload FROM lists WHERE genre = ? AND expires_at > ?"
+        " ORDER BY published_date DESC LIMIT 1"
+    )
+    SELECT_ALL_LATEST = (
+        "SELECT genre, published_date, payload FROM lists AS outer_list WHERE expires_at > ?"
+        " AND published_date = (SELECT MAX(published_date) FROM lists WHERE genre = outer_list.genre AND expires_at > ?)"
+    )
+    TOUCH = "UPDATE lists SET last_access = ? WHERE genre = ? AND published_date = ?"
+    DELETE_EXPIRED = "DELETE FROM lists WHERE expires_at <= ?"
+    TOTALS = "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM lists"
+    OLDEST = "SELECT genre, published_date, size FROM lists ORDER BY last_access LIMIT ?"
+    DELETE_ENTRY = "DELETE FROM lists WHERE genre = ? AND published_date = ?"
+
+    def __init__(self, path: str, ttl: float, max_entries: int = 500, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            self._connection.execute(statement)
+
+    def put(self, genre: str, published_date: str, books: List[dict], ttl: Optional[float] = None):
+        """
+        Store a list, then evict expired and least recently used entries.
+        """
+        payload = json.dumps(books, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(self.UPSERT, (genre, published_date, payload, len(payload), expires_at, now))
+                connection.execute(self.DELETE_EXPIRED, (now,))
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _evict(self, connection: sqlite3.Connection):
+        count, size = connection.execute(self.TOTALS).fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            victims = connection.execute(self.OLDEST, (max(1, count - self.max_entries),)).fetchall()
+            for genre, published_date, entry_size in victims:
+                connection.execute(self.DELETE_ENTRY, (genre, published_date))
+                count -= 1
+                size -= entry_size
+                if count <= self.max_entries and size <= self.max_bytes:
+                    break
+
+    def get(self, genre: str) -> Optional[Tuple[str, List[dict]]]:
+        """
+        Return the newest unexpired ``(published_date, books)`` of a genre.
+        """
+        with self._lock:
+            row = self._connection.execute(self.SELECT_LATEST, (genre, time.time())).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(self.TOUCH, (time.time(), genre, row[0]))
+        return row[0], json.loads(row[1])
+
+    def load_all(self) -> Dict[str, Tuple[str, List[dict]]]:
+        """
+        Return the newest unexpired list of every genre.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(self.SELECT_ALL_LATEST, (now, now)).fetchall()
+        return {genre: (published_date, json.loads(payload)) for genre, published_date, payload in rows}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, size = self._connection.execute(self.TOTALS).fetchone()
+        return {"entries": count, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
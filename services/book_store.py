@@ -0,0 +1,235 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models.nyt import BookResponse
+
+
+def split_url(url: Optional[str]) -> Tuple[str, str]:
+    """
+    Split a URL after its last path separator, so the shared prefix
+    (``https://www.amazon.com/dp/``) can be interned.
+    """
+    if not url:
+        return "", ""
+    path = url.partition("?")[0]
+    cut = path.rfind("/") + 1
+    return sys.intern(url[:cut]), url[cut:]
+
+
+class BookRecord:
+    """
+    Compact stored form of an NYT book. Authors, genres and URL prefixes
+    are interned; a ``BookResponse`` is only built when a book is returned.
+    """
+
+    __slots__ = ("book_uri", "rank", "title", "author", "description", "url_prefix", "url_rest", "genre", "size")
+
+    def __init__(self, book_uri, rank, title, author, description, amazon_url, genre):
+        self.book_uri = book_uri
+        self.rank = rank
+        self.title = title
+        self.author = sys.intern(author) if author else author
+        self.description = description
+        self.url_prefix, self.url_rest = split_url(amazon_url)
+        self.genre = sys.intern(genre) if genre else genre
+        self.size = sys.getsizeof(self) + sum(
+            sys.getsizeof(value) for value in (book_uri, title, self.description, self.url_rest) if value
+        )
+
+    @classmethod
+    def from_nyt(cls, book: dict, genre: str) -> "BookRecord":
+        return cls(
+            book.get("book_uri"),
+            book.get("rank"),
+            book.get("title"),
+            book.get("author"),
+            book.get("description"),
+            book.get("amazon_product_url"),
+            genre,
+        )
+
+    @property
+    def amazon_url(self) -> str:
+        return self.url_prefix + self.url_rest
+
+    def to_response(self) -> BookResponse:
+        return BookResponse(
+            book_uri=self.book_uri,
+            rank=self.rank,
+            title=self.title,
+            author=self.author,
+            description=self.description,
+            amazon_url=self.amazon_url,
+            genre=self.genre,
+        )
+
+
+class BookStore:
+    """
+    Indexed, bounded in-memory store of NYT books.
+
+    Keeps one rank-ordered list per genre, a primary index by ``book_uri``
+    and an author index, so reads only touch the books they return. Once
+    the store holds more than ``max_entries`` books or ``max_bytes`` of
+    records, the least recently used genres are evicted.
+
+    Reads run in the threadpool while fetches replace genres on the event
+    loop, so every access to the indexes holds the store's lock.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.by_uri: Dict[str, BookRecord] = {}
+        self.by_genre: "OrderedDict[str, List[BookRecord]]" = OrderedDict()
+        self.by_author: Dict[str, Dict[str, None]] = {}
+        self.genres_of: Dict[str, set] = {}
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.by_uri)
+
+    def __iter__(self) -> Iterator[BookRecord]:
+        with self._lock:
+            return iter(list(self.by_uri.values()))
+
+    def replace_genre(self, genre: str, books: Iterable[BookRecord]) -> List[BookRecord]:
+        """
+        Replace the ranking of a genre with the given books, then evict
+        other genres if the store is over its bounds.
+        """
+        ranked = sorted(books, key=lambda book: book.rank)
+        with self._lock:
+            self.remove_genre(genre)
+            self.by_genre[genre] = ranked
+            for book in ranked:
+                self.by_uri[book.book_uri] = book
+                self.genres_of.setdefault(book.book_uri, set()).add(genre)
+                self.by_author.setdefault(self._author_key(book.author), {})[book.book_uri] = None
+                self.bytes += book.size
+            self._evict()
+        return ranked
+
+    def remove_genre(self, genre: str):
+        """
+        Drop a genre, and every book that no longer belongs to any genre.
+        """
+        with self._lock:
+            for book in self.by_genre.pop(genre, []):
+                self.bytes -= book.size
+                genres = self.genres_of.get(book.book_uri)
+                if genres is None:
+                    continue
+                genres.discard(genre)
+                if not genres:
+                    self._remove_uri(book.book_uri)
+                elif self.by_uri.get(book.book_uri) is book:
+                    other = next(iter(genres))
+                    self.by_uri[book.book_uri] = next(
+                        record for record in self.by_genre[other] if record.book_uri == book.book_uri
+                    )
+
+    def clear(self):
+        """
+        Remove every book and index entry.
+        """
+        with self._lock:
+            self.by_uri.clear()
+            self.by_genre.clear()
+            self.by_author.clear()
+            self.genres_of.clear()
+            self.bytes = 0
+
+    def get(self, book_uri: str) -> Optional[BookRecord]:
+        return self.by_uri.get(book_uri)
+
+    def genres(self) -> List[str]:
+        with self._lock:
+            return list(self.by_genre)
+
+    def footprint(self) -> Dict[str, int]:
+        """
+        Report the number of books and genres and the approximate size of
+        the stored records in bytes.
+        """
+        with self._lock:
+            return {
+                "books": len(self.by_uri),
+                "genres": len(self.by_genre),
+                "bytes": self.bytes,
+                "evictions": self.evictions,
+            }
+
+    def query(
+        self,
+        genre: Optional[str] = None,
+        author: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[BookRecord], Optional[int]]:
+        """
+        Return a page of books and the offset of the next page, if any.
+        """
+        with self._lock:
+            if genre is not None:
+                books = self.by_genre.get(genre, [])
+                if books:
+                    # A read is a use: it reorders the LRU under the same
+                    # lock that eviction takes.
+                    self.by_genre.move_to_end(genre)
+                if author is not None:
+                    key = self._author_key(author)
+                    books = [book for book in books if self._author_key(book.author) == key]
+            elif author is not None:
+                uris = self.by_author.get(self._author_key(author), {})
+                books = [self.by_uri[uri] for uri in uris]
+            else:
+                books = self.by_uri.values()
+
+            end = None if limit is None else offset + limit
+            page = self._slice(books, offset, end)
+            next_offset = end if end is not None and end < len(books) else None
+            return page, next_offset
+
+    @staticmethod
+    def _slice(books, start: int, end: Optional[int]) -> List[BookRecord]:
+        if isinstance(books, list):
+            return books[start:end]
+        page = []
+        for index, book in enumerate(books):
+            if end is not None and index >= end:
+                break
+            if index >= start:
+                page.append(book)
+        return page
+
+    @staticmethod
+    def _author_key(author: Optional[str]) -> str:
+        return (author or "").strip().casefold()
+
+    def _over_bounds(self) -> bool:
+        return (
+            (self.max_entries is not None and len(self.by_uri) > self.max_entries)
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        )
+
+    def _evict(self):
+        # The most recently replaced genre is kept even if it alone is over.
+        while self._over_bounds() and len(self.by_genre) > 1:
+            self.remove_genre(next(iter(self.by_genre)))
+            self.evictions += 1
+
+    def _remove_uri(self, book_uri: str):
+        book = self.by_uri.pop(book_uri, None)
+        self.genres_of.pop(book_uri, None)
+        if book is None:
+            return
+        key = self._author_key(book.author)
+        uris = self.by_author.get(key)
+        if uris is not None:
+            uris.pop(book_uri, None)
+            if not uris:
+                del self.by_author[key]
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+from services.logs import log_message
+
+
+class AsyncTTLCache:
+    """
+    Single-value async cache with a TTL, stale-while-revalidate and
+    single-flight loading: concurrent misses share one loader call.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale_ttl: Optional[float] = None,
+        name: str = "cache",
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.value = None
+        self.loaded_at: Optional[float] = None
+        self._inflight: Optional[asyncio.Task] = None
+
+    def age(self) -> Optional[float]:
+        """
+        Seconds since the value was loaded, or None when empty.
+        """
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    async def get(self):
+        """
+        Return the cached value, refreshing it when expired.
+        """
+        age = self.age()
+        if age is not None:
+            if age < self.ttl:
+                return self.value
+            if self.stale_ttl is None or age < self.ttl + self.stale_ttl:
+                self._refresh(background=True)
+                return self.value
+        return await asyncio.shield(self._refresh())
+
+    def invalidate(self):
+        """
+        Drop the cached value so the next read loads it again.
+        """
+        self.value = None
+        self.loaded_at = None
+        self._inflight = None
+
+    def _refresh(self, background: bool = False) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        task = self._inflight
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._load())
+            if background:
+                task.add_done_callback(self._log_background_error)
+            self._inflight = task
+        return task
+
+    async def _load(self):
+        value = await self.loader()
+        self.value = value
+        self.loaded_at = time.monotonic()
+        return value
+
+    def _log_background_error(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log_message("Background refresh of %s failed, serving stale value: %s", self.name, task.exception(), level=logging.WARNING)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+import pydantic_core
+from fastapi import HTTPException, Response
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(60 * 60)))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(payload: Any) -> str:
+    """
+    Hash of a request payload, to tell a retry from a reused key.
+    """
+    return hashlib.sha256(pydantic_core.to_json(payload)).hexdigest()
+
+
+class Entry:
+    __slots__ = ("fingerprint", "done", "expires_at", "response", "error")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.expires_at = expires_at
+        self.response: Optional[Response] = None
+        self.error: Optional[HTTPException] = None
+
+
+class IdempotencyCache:
+    """
+    Results of requests by idempotency key, bounded to ``max_keys`` entries
+    and kept for ``ttl`` seconds.
+
+    The first request with a key runs the handler; a repeat gets the stored
+    response (or client error) back, and a concurrent duplicate waits for
+    the first one to finish. Server errors are not stored, so the request
+    can be retried.
+    """
+
+    def __init__(self, ttl: float = 3600, max_keys: int = 10000, wait: float = 30):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.wait = wait
+        self.entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _evict(self, now: float):
+        # Entries are ordered by creation, so expired ones are at the front.
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry.expires_at > now and len(self.entries) <= self.max_keys:
+                break
+            if not entry.done.is_set() and entry.expires_at > now:
+                break
+            del self.entries[key]
+
+    def execute(self, key: str, request_fingerprint: str, handler: Callable[[], Response]) -> Response:
+        """
+        Run ``handler`` once per key and return its response.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                self._evict(now)
+                entry = self.entries.get(key)
+                if entry is None:
+                    entry = self.entries[key] = Entry(request_fingerprint, now + self.ttl)
+                    self._evict(now)
+                    break
+            if entry.fingerprint != request_fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+            if not entry.done.wait(self.wait):
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+            if entry.error is not None:
+                raise HTTPException(status_code=entry.error.status_code, detail=entry.error.detail)
+            if entry.response is not None:
+                return replay(entry.response)
+            # The first request failed with a server error; run it again.
+
+        try:
+            response = handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                self._discard(key, entry)
+            else:
+                entry.error = e
+            entry.done.set()
+            raise
+        except BaseException:
+            self._discard(key, entry)
+            entry.done.set()
+            raise
+        entry.response = response
+        entry.done.set()
+        return response
+
+    def _discard(self, key: str, entry: Entry):
+        with self._lock:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+
+
+def replay(response: Response) -> Response:
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers["Idempotent-Replayed"] = "true"
+    return Response(content=response.body, status_code=response.status_code, headers=headers)
+
+
+idempotency_cache = IdempotencyCache(ttl=IDEMPOTENCY_TTL, max_keys=IDEMPOTENCY_MAX_KEYS, wait=IDEMPOTENCY_WAIT)
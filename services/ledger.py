@@ -0,0 +1,97 @@
+from typing import Callable, Dict, List
+from models.orders import Order, OrderRequest
+from services.money import split_bill, to_cents
+
+NO_SHARE = {"consumption": 0, "taxes": 0, "discounts": 0, "total": 0}
+
+
+class FriendLedger:
+    """
+    Per-friend consumption of an order, updated as rounds are added.
+
+    Tax and discount shares are proportional to consumption. They are
+    allocated in cents for the whole group at once, so they add up exactly
+    to the order's amounts, and are kept until consumption or the order's
+    totals change. If ``Order.rounds`` is replaced from outside, the ledger
+    is rebuilt from it using ``price_of``.
+    """
+
+    def __init__(self, order: Order, price_of: Callable[[str], int]):
+        self.order = order
+        self.price_of = price_of
+        self._rounds = None
+        self._size = -1
+        self.consumption: Dict[str, int] = {}
+        self._generation = 0
+        self._shares_key = None
+        self._shares: Dict[str, Dict[str, int]] = {}
+
+    def _sync(self):
+        rounds = self.order.rounds
+        if rounds is self._rounds and len(rounds) == self._size:
+            return
+        consumption: Dict[str, int] = {}
+        for round_item in rounds:
+            for item in round_item.items:
+                consumption[item.person] = consumption.get(item.person, 0) + item.quantity * self.price_of(item.name)
+        self.consumption = consumption
+        self._rounds = rounds
+        self._size = len(rounds)
+        self._generation += 1
+
+    def add_round(self, order_requests: List[OrderRequest], prices: Dict[str, int]):
+        """
+        Record the consumption of a round that was just appended to the order.
+        """
+        if self.order.rounds is not self._rounds or len(self.order.rounds) != self._size + 1:
+            self._sync()
+            return
+        for req in order_requests:
+            person = req.user.strip()
+            self.consumption[person] = self.consumption.get(person, 0) + req.quantity * prices[req.name]
+        self._size += 1
+        self._generation += 1
+
+    def trim(self, count: int):
+        """
+        Drop the ``count`` oldest rounds from the order, keeping their
+        consumption.
+        """
+        self._sync()
+        del self.order.rounds[:count]
+        self._size = len(self.order.rounds)
+
+    def restore(self, consumption: Dict[str, int]):
+        """
+        Take the consumption of a snapshot whose rounds the order already holds.
+        """
+        self.consumption = dict(consumption)
+        self._rounds = self.order.rounds
+        self._size = len(self.order.rounds)
+        self._generation += 1
+
+    def consumed(self, name: str) -> int:
+        self._sync()
+        return self.consumption.get(name, 0)
+
+    def shares(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return every person's consumption, tax share, discount share and
+        total, in cents.
+        """
+        self._sync()
+        key = (self._generation, self.order.taxes, self.order.discounts)
+        if key != self._shares_key:
+            self._shares = split_bill(
+                {name: to_cents(spent) for name, spent in self.consumption.items()},
+                to_cents(self.order.taxes),
+                to_cents(self.order.discounts),
+            )
+            self._shares_key = key
+        return self._shares
+
+    def share(self, name: str) -> Dict[str, int]:
+        """
+        Return one person's shares of the order, in cents.
+        """
+        return self.shares().get(name, NO_SHARE)
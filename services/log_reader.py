@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+# Lines written before logs were JSON: "2025-01-01 10:00:00,123 - INFO - message".
+PLAIN_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - (\w+) - ")
+
+Line = Tuple[int, int, str]
+
+
+def iter_forward(path: str, offset: int = 0) -> Iterator[Line]:
+    """
+    Yield ``(start, end, line)`` for every complete line from ``offset``,
+    reading the file in chunks. A trailing line still being written is skipped.
+    """
+    with open(path, "rb") as log_file:
+        log_file.seek(offset)
+        buffer = b""
+        position = offset
+        while True:
+            chunk = log_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                end = position + len(raw) + 1
+                yield position, end, raw.decode("utf-8", errors="replace")
+                position = end
+
+
+def iter_backward(path: str, end: Optional[int] = None) -> Iterator[Line]:
+    """
+    Yield ``(start, end, line)`` for complete lines ending at or before
+    ``end`` (default: end of file), newest first, reading chunks from the end.
+    """
+    with open(path, "rb") as log_file:
+        size = log_file.seek(0, os.SEEK_END)
+        position = size if end is None else min(end, size)
+        pending = b""
+
+        def read_more():
+            nonlocal position, pending
+            start = max(0, position - CHUNK_SIZE)
+            log_file.seek(start)
+            pending = log_file.read(position - start) + pending
+            position = start
+
+        # Drop a trailing line that has no newline yet.
+        while position > 0 and not pending.endswith(b"\n"):
+            read_more()
+            newline = pending.rfind(b"\n")
+            if newline != -1:
+                pending = pending[:newline + 1]
+            elif position == 0:
+                pending = b""
+
+        while pending:
+            newline = pending.rfind(b"\n", 0, len(pending) - 1)
+            if newline == -1 and position > 0:
+                read_more()
+                continue
+            raw = pending[newline + 1:]
+            start = position + newline + 1
+            yield start, start + len(raw), raw[:-1].decode("utf-8", errors="replace")
+            pending = pending[:newline + 1]
+
+
+def parse_line(line: str) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Return the level and time of a JSON or legacy plain log line.
+    """
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+            return entry.get("level"), datetime.fromisoformat(entry["time"]) if "time" in entry else None
+        except (ValueError, KeyError, TypeError):
+            return None, None
+    match = PLAIN_LINE.match(line)
+    if match:
+        return match.group(2), datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+    return None, None
+
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is not None:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+
+class LogFilter:
+    """
+    Minimum level and time range filter for log lines.
+    """
+
+    def __init__(self, level: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        self.min_level = logging.getLevelName(level.upper()) if level else None
+        if isinstance(self.min_level, str):
+            raise ValueError(f"Unknown log level: {level}")
+        self.since = as_utc(since)
+        self.until = as_utc(until)
+
+    @property
+    def active(self) -> bool:
+        return self.min_level is not None or self.since is not None or self.until is not None
+
+    def matches(self, line: str) -> bool:
+        if not self.active:
+            return True
+        level, moment = parse_line(line)
+        if self.min_level is not None:
+            if level is None or logging.getLevelName(level) < self.min_level:
+                return False
+        if self.since is not None or self.until is not None:
+            moment = as_utc(moment)
+            if moment is None:
+                return False
+            if self.since is not None and moment < self.since:
+                return False
+            if self.until is not None and moment > self.until:
+                return False
+        return True
+
+
+def make_cursor(path: str, offset: int) -> str:
+    """
+    Return a cursor for ``offset`` that remembers which file it points into.
+    """
+    return f"{os.stat(path).st_ino}:{offset}"
+
+
+def resolve_cursor(path: str, cursor: str) -> Tuple[int, bool]:
+    """
+    Return the offset a cursor points to in the current file and whether
+    reading restarts at 0 because the file was rotated or truncated since
+    the cursor was returned. Plain offsets are only checked against the size.
+    """
+    inode, _, offset = cursor.rpartition(":")
+    if not offset.isdigit() or (inode and not inode.isdigit()):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    stat = os.stat(path)
+    if (inode and int(inode) != stat.st_ino) or int(offset) > stat.st_size:
+        return 0, True
+    return int(offset), False
+
+
+def read_forward(path: str, offset: int, limit: int, log_filter: LogFilter) -> Tuple[List[str], int]:
+    """
+    Return up to ``limit`` matching lines after ``offset`` and the offset to
+    continue from.
+    """
+    lines = []
+    cursor = offset
+    for _, end, line in iter_forward(path, offset):
+        cursor = end
+        if log_filter.matches(line):
+            lines.append(line)
+            if len(lines) >= limit:
+                break
+    return lines, cursor
+
+
+def read_tail(
+    path: str, limit: int, log_filter: LogFilter, before: Optional[int] = None
+) -> Tuple[List[str], int, int]:
+    """
+    Return the last ``limit`` matching lines ending at or before ``before``,
+    oldest first, with the offset of the oldest line scanned (the ``before``
+    of the previous page) and the end of the newest complete line.
+    """
+    lines = []
+    first = last = None
+    for start, end, line in iter_backward(path, before):
+        if last is None:
+            last = end
+        first = start
+        if log_filter.matches(line):
+            lines.append(line)
+            if len(lines) >= limit:
+                break
+    lines.reverse()
+    if last is None:
+        first = last = 0 if before is None else min(before, os.path.getsize(path))
+    return lines, first, last
+
+
+def stream_ndjson(path: str, offset: int, log_filter: LogFilter, limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yield matching lines from ``offset`` as NDJSON; plain lines are wrapped
+    in ``{"message": ...}``.
+    """
+    sent = 0
+    for _, _, line in iter_forward(path, offset):
+        if not log_filter.matches(line):
+            continue
+        if not line.startswith("{"):
+            line = json.dumps({"message": line})
+        yield line.encode("utf-8") + b"\n"
+        sent += 1
+        if limit is not None and sent >= limit:
+            return
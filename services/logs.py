@@ -1,11 +1,89 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
 
-logging.basicConfig(
-    filename="execution.log",
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+LOG_FILE = os.getenv("LOG_FILE", "execution.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Set to a TimedRotatingFileHandler "when" value (e.g. "midnight") to rotate by time instead of size.
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")
 
+request_id_var = contextvars.ContextVar("request_id", default=None)
 
-def log_message(message: str):
-    logging.info(message)
+logger = logging.getLogger("cometa")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line with the request id and any structured fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread, so callers
+    only pay for enqueueing the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+
+def build_file_handler() -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, build_file_handler(), respect_handler_level=True)
+logger.addHandler(DeferredQueueHandler(log_queue))
+listener.start()
+
+
+@atexit.register
+def stop_logging():
+    """
+    Drain the queue and stop the background writer.
+    """
+    if listener._thread is not None:
+        listener.stop()
+
+
+def log_message(message: str, *args, level: int = logging.INFO, **fields):
+    """
+    Log a message. ``args`` are %-formatted lazily, by the writer thread and
+    only when the level is enabled; keyword arguments become JSON fields.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, *args, extra={"fields": fields})
@@ -0,0 +1,229 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ThreadShards:
+    """
+    One dict per thread, so updates never take a lock; readers merge them.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def shards(self) -> List[dict]:
+        with self._lock:
+            return [dict(shard) for shard in self._shards]
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = ThreadShards()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shards.shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._shards.shards():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {format_value(value)}" for key, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge(Metric):
+    """
+    Gauge whose value is read from ``collect`` (a callable returning a
+    value per label tuple) when metrics are exposed.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.collect = dict
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        return self.collect()
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {format_value(value)}" for key, value in sorted(self.values().items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shards.shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket counts (not cumulative), then +Inf, sum.
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+                break
+        else:
+            state[len(self.buckets)] += 1
+        state[-1] += value
+
+    def values(self) -> Dict[Tuple[str, ...], list]:
+        totals: Dict[Tuple[str, ...], list] = {}
+        for shard in self._shards.shards():
+            for key, state in shard.items():
+                state = list(state)
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], state)]
+                else:
+                    totals[key] = state
+        return totals
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                labels = self._labels(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {format_value(state[-1])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.")
+nyt_requests_total = Counter(
+    "nyt_requests_total", "Calls to the NYT API by endpoint and outcome.", ("endpoint", "outcome")
+)
+nyt_request_duration_seconds = Histogram(
+    "nyt_request_duration_seconds", "NYT API call latency by endpoint.", ("endpoint",)
+)
+background_task_duration_seconds = Histogram(
+    "background_task_duration_seconds", "Background task attempt duration.", ("task", "outcome"),
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0),
+)
+nyt_books_cache = CallbackGauge(
+    "nyt_books_cache", "Size of the in-memory NYT book store.", ("measure",)
+)
+
+REGISTRY = [
+    http_requests_total,
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    nyt_requests_total,
+    nyt_request_duration_seconds,
+    background_task_duration_seconds,
+    nyt_books_cache,
+]
+
+
+@contextmanager
+def track_nyt(endpoint: str):
+    """
+    Time an NYT call. The block sets ``call["status"]``; exceptions count
+    as errors.
+    """
+    call = {"status": None}
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        nyt_requests_total.inc(endpoint=endpoint, outcome=type(e).__name__)
+        raise
+    else:
+        nyt_requests_total.inc(endpoint=endpoint, outcome=str(call["status"]))
+    finally:
+        nyt_request_duration_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+@contextmanager
+def track_task(task: str):
+    """
+    Time one attempt of a background task.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        background_task_duration_seconds.observe(time.perf_counter() - start, task=task, outcome=outcome)
+
+
+def expose() -> str:
+    """
+    Render every metric in the Prometheus text format.
+    """
+    return "\n".join(metric.expose() for metric in REGISTRY) + "\n"
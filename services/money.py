@@ -0,0 +1,96 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Sequence, Union
+
+Number = Union[int, float, Decimal]
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(amount: Number) -> int:
+    """
+    Convert an amount in currency units to integer cents, rounding half up.
+    """
+    if isinstance(amount, int):
+        return amount * CENTS_PER_UNIT
+    return int((Decimal(str(amount)) * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """
+    Convert integer cents to currency units.
+    """
+    return cents / CENTS_PER_UNIT
+
+
+def apply_rate(cents: int, rate: Number) -> int:
+    """
+    Return ``cents * rate`` rounded half up to a whole cent.
+    """
+    return int((Decimal(cents) * Decimal(str(rate))).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def allocate(total: int, weights: Sequence[int]) -> List[int]:
+    """
+    Split ``total`` cents proportionally to ``weights`` with the largest
+    remainder method.
+
+    Shares always add up to ``total`` exactly, each is within one cent of
+    its exact proportion, and ties go to the earlier weight, so the result
+    is deterministic. All-zero weights split the total equally.
+    """
+    count = len(weights)
+    if count == 0:
+        return []
+    weight_sum = sum(weights)
+    if weight_sum == 0:
+        weights, weight_sum = [1] * count, count
+
+    magnitude = abs(total)
+    shares = [magnitude * weight // weight_sum for weight in weights]
+    leftover = magnitude - sum(shares)
+    if leftover:
+        remainders = [magnitude * weight % weight_sum for weight in weights]
+        # Sorting is stable in reverse too, so equal remainders favour the
+        # earlier weight.
+        for index in sorted(range(count), key=remainders.__getitem__, reverse=True)[:leftover]:
+            shares[index] += 1
+    if total < 0:
+        return [-share for share in shares]
+    return shares
+
+
+def split_equal(total: int, count: int) -> List[int]:
+    """
+    Split ``total`` cents into ``count`` shares that differ by at most one
+    cent, the larger ones first, as ``allocate`` does with equal weights.
+    """
+    if count == 0:
+        return []
+    share, leftover = divmod(abs(total), count)
+    shares = [share + 1] * leftover + [share] * (count - leftover)
+    if total < 0:
+        return [-share for share in shares]
+    return shares
+
+
+def split_bill(consumption: Dict[str, int], taxes: int, discounts: int) -> Dict[str, Dict[str, int]]:
+    """
+    Every person's consumption, tax share, discount share and total, in cents,
+    computed in one pass over the group.
+
+    Taxes and discounts are allocated proportionally to consumption, so the
+    shares of each add up exactly to the order's amounts.
+    """
+    names = list(consumption)
+    weights = [consumption[name] for name in names]
+    tax_shares = allocate(taxes, weights)
+    discount_shares = allocate(discounts, weights)
+    return {
+        name: {
+            "consumption": spent,
+            "taxes": tax,
+            "discounts": discount,
+            "total": spent + tax - discount,
+        }
+        for name, spent, tax, discount in zip(names, weights, tax_shares, discount_shares)
+    }
@@ -1,43 +1,218 @@
+import asyncio
+import logging
 import os
+import threading
+import httpx
 import requests
 from dotenv import load_dotenv
+from services.book_disk_cache import BookDiskCache
+from services.book_store import BookRecord, BookStore
+from services.cache import AsyncTTLCache
 from services.logs import log_message
-from models.nyt import BookResponse
+from services.metrics import nyt_books_cache, track_nyt
+from services.versioning import books_version
 
 load_dotenv()
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Fields of an NYT book kept in the disk cache.
+DISK_FIELDS = ("book_uri", "rank", "title", "author", "description", "amazon_product_url")
+
+
 class NYTService:
     BASE_URL = "https://api.nytimes.com/svc/books/v3"
     API_KEY = os.getenv("NYT_API_KEY")
-    books_cache = set()
+    MAX_CONNECTIONS = int(os.getenv("NYT_MAX_CONNECTIONS", "20"))
+    MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("NYT_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    KEEPALIVE_EXPIRY = float(os.getenv("NYT_KEEPALIVE_EXPIRY", "30"))
+    TIMEOUT = float(os.getenv("NYT_TIMEOUT", "10"))
+    GENRES_TTL = float(os.getenv("NYT_GENRES_TTL", str(24 * 60 * 60)))
+    GENRES_STALE_TTL = float(os.getenv("NYT_GENRES_STALE_TTL", str(7 * 24 * 60 * 60)))
+    DISK_CACHE_PATH = os.getenv("NYT_DISK_CACHE_PATH", "")
+    DISK_CACHE_TTL = float(os.getenv("NYT_DISK_CACHE_TTL", str(24 * 60 * 60)))
+    DISK_CACHE_MAX_ENTRIES = int(os.getenv("NYT_DISK_CACHE_MAX_ENTRIES", "500"))
+    DISK_CACHE_MAX_BYTES = int(os.getenv("NYT_DISK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    BOOKS_MAX_ENTRIES = int(os.getenv("NYT_BOOKS_MAX_ENTRIES", "10000"))
+    BOOKS_MAX_BYTES = int(os.getenv("NYT_BOOKS_MAX_BYTES", str(32 * 1024 * 1024)))
+    books_cache = BookStore(max_entries=BOOKS_MAX_ENTRIES, max_bytes=BOOKS_MAX_BYTES)
     genres_cache = []
+    async_client = None
+    genres_store = None
+    disk_cache = None
+    disk_cache_loaded = False
+    # Held while the disk cache is loaded, so readers wait for the warm store.
+    warm_lock = threading.Lock()
+    # published_date of the list each genre in books_cache was stored from.
+    published_dates = {}
 
-    def fetch_books(self, genre: str):
+    # Async client lifecycle
+    @classmethod
+    async def startup(cls):
+        """
+        Open the shared async client used by every NYTService instance.
+        """
+        cls.get_async_client()
+        cls.get_disk_cache()
+        log_message("NYT async client started (http2=%s).", HTTP2_AVAILABLE)
+
+    @classmethod
+    async def shutdown(cls):
+        """
+        Close the shared async client and its pooled connections.
         """
-        Fetch books by genre from NYT.
+        if cls.async_client is not None:
+            await cls.async_client.aclose()
+            cls.async_client = None
+            log_message("NYT async client closed.")
+        if cls.disk_cache is not None:
+            cls.disk_cache.close()
+            cls.disk_cache = None
+            cls.disk_cache_loaded = False
+
+    @classmethod
+    def get_async_client(cls) -> httpx.AsyncClient:
+        """
+        Return the shared async client, creating it on first use.
+        """
+        if cls.async_client is None or cls.async_client.is_closed:
+            cls.async_client = httpx.AsyncClient(
+                base_url=cls.BASE_URL,
+                http2=HTTP2_AVAILABLE,
+                timeout=cls.TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=cls.MAX_CONNECTIONS,
+                    max_keepalive_connections=cls.MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=cls.KEEPALIVE_EXPIRY,
+                ),
+            )
+        return cls.async_client
+
+    # Disk cache
+    @classmethod
+    def get_disk_cache(cls):
+        """
+        Return the on-disk book cache, opening it on first use. Returns None
+        when NYT_DISK_CACHE_PATH is not set.
+        """
+        if cls.disk_cache is None and cls.DISK_CACHE_PATH:
+            cls.disk_cache = BookDiskCache(
+                cls.DISK_CACHE_PATH,
+                ttl=cls.DISK_CACHE_TTL,
+                max_entries=cls.DISK_CACHE_MAX_ENTRIES,
+                max_bytes=cls.DISK_CACHE_MAX_BYTES,
+            )
+        return cls.disk_cache
+
+    def warm_books(self):
         """
+        Load the newest list of every genre from the disk cache, once per
+        process. Genres already fetched by this process are kept.
+        """
+        if NYTService.disk_cache_loaded:
+            return
+        with NYTService.warm_lock:
+            if NYTService.disk_cache_loaded:
+                return
+            disk_cache = self.get_disk_cache()
+            if disk_cache is not None:
+                entries = disk_cache.load_all()
+                loaded = self.books_cache.genres()
+                for genre, (published_date, books) in entries.items():
+                    if genre not in loaded:
+                        self._store_books(genre, books, published_date, persist=False)
+                log_message("Books warmed from disk cache: %d genres", len(entries))
+            # Only set once the store is warm; a failed load is tried again.
+            NYTService.disk_cache_loaded = True
+
+    def _cached_books(self, genre: str):
+        disk_cache = self.get_disk_cache()
+        entry = disk_cache.get(genre) if disk_cache is not None else None
+        if entry is None:
+            return None
+        log_message("Books for genre '%s' served from disk cache (%s)", genre, entry[0])
+        return self._store_books(genre, entry[1], entry[0], persist=False)
+
+    def _store_books(self, genre: str, books, published_date: str = None, persist: bool = True):
+        """
+        Put a genre's list in the book store, unless the store already holds
+        that published list, and write it to the disk cache if ``persist``.
+        """
+        ranked = None
+        if published_date and NYTService.published_dates.get(genre) == published_date:
+            # Nothing changed: keep the stored list and every books ETag.
+            ranked = self.books_cache.query(genre=genre)[0] or None
+        if ranked is None:
+            ranked = self.books_cache.replace_genre(genre, [BookRecord.from_nyt(book, genre) for book in books])
+            NYTService.published_dates[genre] = published_date
+            books_version.bump()
+
+        disk_cache = self.get_disk_cache()
+        if persist and disk_cache is not None and published_date:
+            disk_cache.put(genre, published_date, [
+                {key: book.get(key) for key in DISK_FIELDS} for book in books
+            ])
+        return ranked
+
+    def fetch_books(self, genre: str, refresh: bool = False):
+        """
+        Fetch books by genre from NYT. An unexpired list in the disk cache
+        is used instead unless refresh is set.
+        """
+        if not refresh:
+            cached = self._cached_books(genre)
+            if cached is not None:
+                return cached
+
         url = f"{self.BASE_URL}/lists/current/{genre}.json"
         params = {"api-key": self.API_KEY}
-        response = requests.get(url, params=params)
+        with track_nyt("books") as call:
+            response = requests.get(url, params=params)
+            call["status"] = response.status_code
 
         if response.status_code != 200:
-            log_message(f"Error fetching books: {response.status_code}")
+            log_message("Error fetching books: %s", response.status_code, level=logging.ERROR, genre=genre)
             response.raise_for_status()
 
-        books = response.json().get("results", {}).get("books", [])
-        log_message(f"Books found for genre '{genre}': {len(books)}")
+        results = response.json().get("results", {})
+        books = results.get("books", [])
+        log_message("Books found for genre '%s': %d", genre, len(books))
 
-        for book in books:
-            self.books_cache.add(BookResponse(
-                book_uri=book.get("book_uri"),
-                rank=book.get("rank"),
-                title=book.get("title"),
-                author=book.get("author"),
-                description=book.get("description"),
-                amazon_url=book.get("amazon_product_url"),
-            ))
+        return self._store_books(genre, books, results.get("published_date"))
 
-        return list(self.books_cache)
+    async def afetch_books(self, genre: str, refresh: bool = False):
+        """
+        Fetch books by genre from NYT using the shared async client. An
+        unexpired list in the disk cache is used instead unless refresh is set.
+        Disk cache reads and writes run in a worker thread, off the event loop.
+        """
+        disk_cache = self.get_disk_cache()
+        if not refresh and disk_cache is not None:
+            cached = await asyncio.to_thread(self._cached_books, genre)
+            if cached is not None:
+                return cached
+
+        client = self.get_async_client()
+        with track_nyt("books") as call:
+            response = await client.get(f"/lists/current/{genre}.json", params={"api-key": self.API_KEY})
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            log_message("Error fetching books: %s", response.status_code, level=logging.ERROR, genre=genre)
+            response.raise_for_status()
+
+        results = response.json().get("results", {})
+        books = results.get("books", [])
+        log_message("Books found for genre '%s': %d", genre, len(books))
+
+        if disk_cache is not None:
+            return await asyncio.to_thread(self._store_books, genre, books, results.get("published_date"))
+        return self._store_books(genre, books, results.get("published_date"))
 
     def fetch_genres(self):
         """
@@ -45,27 +220,93 @@ class NYTService:
         """
         url = f"{self.BASE_URL}/lists/names.json"
         params = {"api-key": self.API_KEY}
-        response = requests.get(url, params=params)
+        with track_nyt("genres") as call:
+            response = requests.get(url, params=params)
+            call["status"] = response.status_code
 
         if response.status_code != 200:
-            log_message(f"Error fetching genres: {response.status_code}")
+            log_message("Error fetching genres: %s", response.status_code, level=logging.ERROR)
             response.raise_for_status()
 
         genres = response.json().get("results", [])
-        log_message(f"Genres fetched: {len(genres)}")
+        log_message("Genres fetched: %d", len(genres))
 
         self.genres_cache = genres
         return genres
 
+    async def afetch_genres(self):
+        """
+        Fetch genres from NYT using the shared async client.
+        """
+        client = self.get_async_client()
+        with track_nyt("genres") as call:
+            response = await client.get("/lists/names.json", params={"api-key": self.API_KEY})
+            call["status"] = response.status_code
+
+        if response.status_code != 200:
+            log_message("Error fetching genres: %s", response.status_code, level=logging.ERROR)
+            response.raise_for_status()
+
+        genres = response.json().get("results", [])
+        log_message("Genres fetched: %d", len(genres))
+
+        NYTService.genres_cache = genres
+        return genres
+
+    async def get_genres(self):
+        """
+        Return genres from the TTL cache, fetching them from NYT at most once
+        per expiry no matter how many callers miss at the same time.
+        """
+        if NYTService.genres_store is None:
+            NYTService.genres_store = AsyncTTLCache(
+                NYTService().afetch_genres,
+                ttl=self.GENRES_TTL,
+                stale_ttl=self.GENRES_STALE_TTL,
+                name="NYT genres",
+            )
+        return await NYTService.genres_store.get()
+
+    def reset_genres(self):
+        """
+        Clear cached genres.
+        """
+        if NYTService.genres_store is not None:
+            NYTService.genres_store.invalidate()
+        NYTService.genres_cache = []
+
     def reset_books(self):
         """
         Clear cached books.
         """
         self.books_cache.clear()
+        NYTService.published_dates.clear()
+        NYTService.disk_cache_loaded = True
+        books_version.bump()
         log_message("Books cache reset.")
 
     def get_cached_books(self):
         """
         Return cached books as a list.
         """
-        return list(self.books_cache)
+        self.warm_books()
+        return [book.to_response() for book in self.books_cache]
+
+    def query_books(self, genre=None, author=None, limit=None, offset=0):
+        """
+        Return one page of cached books and the offset of the next page.
+        """
+        self.warm_books()
+        page, next_offset = self.books_cache.query(genre=genre, author=author, limit=limit, offset=offset)
+        return [book.to_response() for book in page], next_offset
+
+    def books_footprint(self):
+        """
+        Return the size of the in-memory book store.
+        """
+        return self.books_cache.footprint()
+
+
+nyt_books_cache.collect = lambda: {
+    (measure,): value for measure, value in NYTService.books_cache.footprint().items()
+}
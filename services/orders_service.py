@@ -1,25 +1,45 @@
+import asyncio
+import logging
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
-import random
+from typing import Dict, List, Optional
+import os
 from functools import wraps
 
 from models.orders import (
     Beer,
     OrderRequest,
-    OrderItem,
     Round,
     RoundItem,
     Friend,
-    Order,
+    FriendShare,
     Stock,
     StockRequest,
     PaidModeEnum,
+    RoundRequest,
+    RoundResult,
+    PriceAdjustment,
+    TabPricing,
 )
 from fastapi import HTTPException
+from services.ledger import NO_SHARE
+from services.logs import log_message
+from services.money import from_cents, split_equal, to_cents
+from services.pricing import pricing_engine
+from services.push import broadcaster
+from services.stock_index import StockIndex
+from services.storage import create_storage
+from services.tabs import DEFAULT_TAB_ID, Tab, TabRegistry
+from services.versioning import order_version, stock_version
 
 # Constants
-TAX_RATE = 0.19
-MAX_DISCOUNT_RATE = [0.05, 0.10, 0.15]
+# Rounds kept in the live order (with a durable storage backend older ones
+# stay in the event history), and events between tab snapshots.
+LIVE_ROUNDS = int(os.getenv("ORDERS_LIVE_ROUNDS", "50"))
+SNAPSHOT_EVERY = int(os.getenv("ORDERS_SNAPSHOT_EVERY", "100"))
+# Seconds between checks for events journaled by other workers, so their
+# changes reach this worker's streams without waiting for a request.
+SYNC_INTERVAL = float(os.getenv("ORDERS_SYNC_INTERVAL", "1"))
 
 # Data
 stock = Stock(
@@ -31,20 +51,18 @@ stock = Stock(
     ],
 )
 
-friends = {}
-
-current_order = Order(
-    created=datetime.now(),
-    paid=False,
-    subtotal=0,
-    taxes=0,
-    discounts=0,
-    discounts_str="",
-    total=0,
-    paid_mode=PaidModeEnum.unknown,
-    items=[],
-    rounds=[],
-)
+stock_index = StockIndex(stock)
+storage = create_storage(stock_index)
+reserver = storage.reserver
+
+tabs = TabRegistry(stock_index.price)
+
+# The default tab backs the tab-less /beers routes.
+default_tab = Tab(DEFAULT_TAB_ID, stock_index.price, version=order_version)
+friends = default_tab.friends
+current_order = default_tab.order
+order_totals = default_tab.totals
+ledger = default_tab.ledger
 
 
 # Stock Management
@@ -52,138 +70,207 @@ def fill_stock(stock_request: StockRequest):
     """
     Updates stock with the items in the request.
     """
-    for item in stock_request.items:
-        existing_beer = next((beer for beer in stock.beers if beer.name == item.name), None)
-        if existing_beer:
-            existing_beer.quantity += item.quantity
-        else:
-            stock.beers.append(Beer(name=item.name, price=item.price, quantity=item.quantity))
+    with journal_write():
+        storage.fill(stock_request.items)
     stock.last_updated = datetime.now()
+    stock_version.bump()
+    publish_stock(item.name for item in stock_request.items)
+
+
+def refresh_stock():
+    """
+    Picks up stock changes made by other workers sharing the storage.
+    """
+    if storage.refresh_stock():
+        stock.last_updated = datetime.now()
+        stock_version.bump()
+        broadcaster.publish("stock", "stock", stock_state())
 
 
 # Order Management
-def calculate_order_totals():
+def calculate_order_totals(tab: Tab = None):
     """
-    Calculates and updates the totals for the current order.
+    Calculates and updates the totals for the current order from the pricing plan.
     """
-    grouped_items = {}
-    for item in current_order.items:
-        if item.name in grouped_items:
-            grouped_items[item.name]["quantity"] += item.quantity
-            grouped_items[item.name]["total"] += item.total
-        else:
-            grouped_items[item.name] = {"quantity": item.quantity, "total": item.total}
+    tab = tab or default_tab
+    current_order = tab.order
+    prices = pricing_engine.price(tab)
 
-    current_order.items = [
-        OrderItem(name=name, quantity=data["quantity"], total=data["total"])
-        for name, data in grouped_items.items()
-    ]
+    current_order.subtotal = from_cents(prices.subtotal)
+    current_order.taxes = from_cents(prices.taxes)
+    current_order.discounts = from_cents(prices.discounts)
+    current_order.discounts_str = prices.label
+    current_order.total = from_cents(prices.total)
 
-    subtotal = sum(item.total for item in current_order.items)
-    taxes = round(subtotal * TAX_RATE, 2)
-    discount_rate = random.choice(MAX_DISCOUNT_RATE)
-    discounts = round(subtotal * discount_rate, 2)
-    total = round(subtotal + taxes - discounts, 2)
 
-    current_order.subtotal = subtotal
-    current_order.taxes = taxes
-    current_order.discounts = discounts
-    current_order.discounts_str = f"{int(discount_rate * 100)}% off"
-    current_order.total = total
+def tab_pricing(tab: Tab = None) -> TabPricing:
+    """
+    Returns how the pricing plan prices a tab, rule by rule.
+    """
+    tab = tab or default_tab
+    with tab.lock:
+        prices = pricing_engine.price(tab)
+        return TabPricing(
+            tab_id=tab.tab_id,
+            plan_version=tab.prices.key[0],
+            subtotal=from_cents(prices.subtotal),
+            taxes=from_cents(prices.taxes),
+            discounts=from_cents(prices.discounts),
+            total=from_cents(prices.total),
+            adjustments=[
+                PriceAdjustment(rule=name, kind=kind, amount=from_cents(cents))
+                for name, kind, cents in prices.adjustments
+            ],
+            evaluations=tab.prices.evaluations,
+        )
 
 
 def validate_payment_mode(mode):
     def decorator(func):
         @wraps(func)
-        def wrapper(*args, **kwargs):
-            if current_order.paid_mode != PaidModeEnum.unknown and current_order.paid_mode != mode:
+        def wrapper(*args, tab: Tab = None, **kwargs):
+            tab = tab or default_tab
+            paid_mode = tab.order.paid_mode
+            if paid_mode != PaidModeEnum.unknown and paid_mode != mode:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Cannot process {mode.value} payment when {current_order.paid_mode.value} payment is already in progress."
+                    detail=f"Cannot process {mode.value} payment when {paid_mode.value} payment is already in progress."
                 )
-            return func(*args, **kwargs)
+            return func(*args, tab=tab, **kwargs)
         return wrapper
     return decorator
 
-def update_stock_and_order(order_requests: List[OrderRequest]):
+def update_stock_and_order(order_requests: List[OrderRequest], tab: Tab = None):
     """
     Updates stock and processes the items in the current order.
     """
+    apply_rounds([RoundRequest(items=order_requests)], tab)
+
+
+def apply_rounds(round_requests: List[RoundRequest], tab: Tab = None) -> List[RoundResult]:
+    """
+    Applies many rounds at once: one all-or-nothing stock reservation for
+    all of them and one totals recomputation at the end.
+    """
+    tab = tab or default_tab
+    if not round_requests:
+        raise HTTPException(status_code=400, detail="Batches must have at least one round")
+    quantities = {}
+    for round_request in round_requests:
+        if not round_request.items:
+            raise HTTPException(status_code=400, detail="Rounds must have at least one item")
+        for req in round_request.items:
+            quantities[req.name] = quantities.get(req.name, 0) + req.quantity
+
+    with journal_write(tab):
+        prices = storage.reserve(quantities)
+
+        results, new_rounds = [], []
+        # Happy hours go by when the rounds arrive: ``created`` comes from the
+        # client and could be backdated into a discount window.
+        received = datetime.now()
+        with tab.lock:
+            for round_request in round_requests:
+                new_round = add_round(tab, round_request.items, prices, round_request.created or received, received)
+                storage.record_round(tab.tab_id, new_round, prices, received)
+                new_rounds.append(new_round)
+                results.append(RoundResult(
+                    index=tab.round_count - 1,
+                    created=new_round.created,
+                    items=len(new_round.items),
+                    subtotal=sum(prices[req.name] * req.quantity for req in round_request.items),
+                ))
+            calculate_order_totals(tab)
+            checkpoint(tab, len(round_requests))
+            tab.version.bump()
+            stock_version.bump()
+            # Published under the lock, so a tab's diffs go out in version order.
+            publish_stock(quantities)
+            broadcaster.publish(tab_topic(tab), "order", order_diff(tab, new_rounds, quantities))
+    return results
+
+
+def add_round(
+    tab: Tab, order_requests: List[OrderRequest], prices: Dict[str, int], created: datetime, received: datetime
+) -> Round:
+    """
+    Adds an already reserved round to the tab's order, friends and aggregates,
+    priced as of when the server received it. Totals are left for the caller
+    to recompute.
+    """
     new_round = Round(
-        created=datetime.now(),
+        created=created,
         items=[
             RoundItem(name=req.name, quantity=req.quantity, person=req.user.strip())
             for req in order_requests
         ],
     )
-
+    happy_hour = pricing_engine.plan.happy_hour(received)
     for req in order_requests:
-        beer = next((b for b in stock.beers if b.name == req.name), None)
-        if not beer:
-            raise HTTPException(status_code=404, detail=f"Beer {req.name} not found")
+        tab.totals.add(req.name, req.quantity, prices[req.name] * req.quantity)
+        if happy_hour is not None:
+            tab.happy_hour[happy_hour] = tab.happy_hour.get(happy_hour, 0) + prices[req.name] * req.quantity
 
-        if beer.quantity < req.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough stock for {req.name}")
+        if req.user.strip() not in tab.friends:
+            tab.friends[req.user.strip()] = Friend(name=req.user.strip(), balance=0)
 
-        total = beer.price * req.quantity
-        beer.quantity -= req.quantity
-
-        current_order.items.append(
-            OrderItem(name=req.name, quantity=req.quantity, total=total)
-        )
-
-        if req.user.strip() not in friends:
-            friends[req.user.strip()] = Friend(name=req.user.strip(), balance=0)
-
-    current_order.rounds.append(new_round)
-    calculate_order_totals()
+    tab.order.rounds.append(new_round)
+    tab.ledger.add_round(order_requests, prices)
+    return new_round
 
 
 # Payment Management
-def pay_bill(pay_request):
+def pay_bill(pay_request, tab: Tab = None):
     """
     Processes the payment for the current order, either equally or individually.
     """
-    if current_order.paid:
-        raise HTTPException(status_code=400, detail="The bill has already been paid.")
+    tab = tab or default_tab
+    with journal_write(tab), tab.lock:
+        if tab.order.paid:
+            raise HTTPException(status_code=400, detail="The bill has already been paid.")
 
-    if  pay_request.mode == PaidModeEnum.equal:
-        return process_equal_payment()
+        if  pay_request.mode == PaidModeEnum.equal:
+            return process_equal_payment(tab=tab)
 
-    if pay_request.mode == PaidModeEnum.individual:
-        return process_individual_payment(pay_request.friend)
+        if pay_request.mode == PaidModeEnum.individual:
+            return process_individual_payment(pay_request.friend, tab=tab)
 
     raise HTTPException(status_code=400, detail="Invalid payment mode")
 
 @validate_payment_mode(PaidModeEnum.equal)
-def process_equal_payment():
+def process_equal_payment(tab: Tab = None):
     """
     Splits the bill equally among all friends and processes the payment.
     """
+    friends, current_order = tab.friends, tab.order
     if not friends:
         raise HTTPException(status_code=400, detail="No friends found to split the bill.")
 
-    share = round(current_order.total / len(friends), 2)
-    total_paid = sum(friend.balance for friend in friends.values())
-    if total_paid + (share * len(friends)) > current_order.total:
+    remaining = to_cents(current_order.total) - friends.total_paid_cents
+    if remaining <= 0:
         raise HTTPException(status_code=400, detail="The payment exceeds the total bill.")
 
-    for friend in friends.values():
-        friend.balance += share
-    
+    # Shares differ by at most one cent and add up exactly to what is left.
+    credits = {name: from_cents(cents) for name, cents in zip(friends, split_equal(remaining, len(friends)))}
+    for name, amount in credits.items():
+        friends.credit(name, amount)
+    storage.record_payment(tab.tab_id, PaidModeEnum.equal.value, credits)
+    checkpoint(tab)
+
     current_order.paid_mode = PaidModeEnum.equal
-    return finalize_payment()
+    return finalize_payment(tab, credits)
 
 @validate_payment_mode(PaidModeEnum.individual)
-def process_individual_payment(friend_name: str):
+def process_individual_payment(friend_name: str, tab: Tab = None):
     """
     Processes a payment for a specific friend.
     """
+    friends, current_order = tab.friends, tab.order
     friend = friends.get(friend_name)
     if not friend:
         raise HTTPException(status_code=404, detail=f"Friend {friend_name} not found.")
 
-    total_due = calculate_individual_due(friend_name)
+    total_due = individual_due_cents(friend_name, tab)
 
     if total_due <= 0:
         raise HTTPException(
@@ -191,40 +278,54 @@ def process_individual_payment(friend_name: str):
             detail=f"{friend_name} has already paid their total amount."
         )
 
-    payment = min(total_due, current_order.total - sum(f.balance for f in friends.values()))
-    friend.balance += payment
+    payment = from_cents(min(total_due, to_cents(current_order.total) - friends.total_paid_cents))
+    friends.credit(friend_name, payment)
+    storage.record_payment(tab.tab_id, PaidModeEnum.individual.value, {friend_name: payment})
+    checkpoint(tab)
     current_order.paid_mode = PaidModeEnum.individual
-    return finalize_payment()
+    return finalize_payment(tab, {friend_name: payment})
+
 
+def individual_due_cents(friend_name: str, tab: Tab = None) -> int:
+    tab = tab or default_tab
+    return tab.ledger.share(friend_name)["total"] - to_cents(tab.friends[friend_name].balance)
 
-def calculate_individual_due(friend_name: str) -> float:
+
+def calculate_individual_due(friend_name: str, tab: Tab = None) -> float:
     """
     Calculates the total amount a specific friend owes.
     """
-    total_due = 0
-
-    for round_item in current_order.rounds:
-        for item in round_item.items:
-            if item.person == friend_name:
-                beer_price = next((b.price for b in stock.beers if b.name == item.name), 0)
-                item_total = item.quantity * beer_price
-                item_taxes = item_total * TAX_RATE
-                item_discount = (
-                    item_total * (current_order.discounts / current_order.subtotal)
-                    if current_order.subtotal > 0 else 0
-                )
-                total_due += item_total + item_taxes - item_discount
-
-    return total_due - friends[friend_name].balance
+    return from_cents(individual_due_cents(friend_name, tab))
 
 
-def finalize_payment():
+def friend_shares(tab: Tab = None) -> List[FriendShare]:
+    """
+    Returns every friend's consumption, tax and discount shares and balance.
+    """
+    tab = tab or default_tab
+    all_shares = tab.ledger.shares()
+    shares = []
+    for friend in tab.friends.values():
+        share = all_shares.get(friend.name, NO_SHARE)
+        shares.append(FriendShare(
+            name=friend.name,
+            paid=friend.balance,
+            due=from_cents(share["total"] - to_cents(friend.balance)),
+            **{key: from_cents(cents) for key, cents in share.items()},
+        ))
+    return shares
+
+
+def finalize_payment(tab: Tab = None, credits: Dict[str, float] = None):
     """
     Finalizes the payment, checks if the order is fully paid, and updates the status.
     """
-    total_paid = sum(friend.balance for friend in friends.values())
-    if total_paid >= current_order.total:
+    tab = tab or default_tab
+    friends, current_order = tab.friends, tab.order
+    if friends.total_paid_cents >= to_cents(current_order.total):
         current_order.paid = True
+    tab.version.bump()
+    broadcaster.publish(tab_topic(tab), "payment", payment_diff(tab, credits or {}))
 
     return {
         "message": "Payment processed successfully.",
@@ -232,3 +333,276 @@ def finalize_payment():
         "bill_status": "Paid" if current_order.paid else "Pending",
         "order": current_order,
     }
+
+
+# Push
+def tab_topic(tab: Tab) -> str:
+    return f"tab:{tab.tab_id}"
+
+
+def stock_state(names=None) -> dict:
+    """
+    Returns the price and quantity of the given beers, or of every beer.
+    """
+    beers = {}
+    for name in (beer.name for beer in list(stock.beers)) if names is None else names:
+        beer = stock_index.get(name)
+        if beer is not None:
+            beers[name] = {"price": beer.price, "quantity": beer.quantity}
+    return {"version": stock_version.version, "beers": beers}
+
+
+def publish_stock(names):
+    """
+    Pushes the price and quantity of the given beers to stock subscribers.
+    """
+    broadcaster.publish("stock", "stock", stock_state(names))
+
+
+def bill_state(tab: Tab = None) -> dict:
+    """
+    Returns a tab's totals, items and balances, which later diffs apply to.
+    """
+    tab = tab or default_tab
+    with tab.lock:
+        order = tab.order.model_dump(exclude={"rounds"})
+        order["round_count"] = tab.round_count
+        return {
+            "tab_id": tab.tab_id,
+            "version": tab.version.version,
+            "order": order,
+            "balances": {name: friend.balance for name, friend in tab.friends.items()},
+            "total_paid": tab.friends.total_paid,
+        }
+
+
+def order_diff(tab: Tab, new_rounds: List[Round], names) -> dict:
+    """
+    Returns the new rounds of a tab, the aggregates they changed and its totals.
+    """
+    order = tab.order
+    return {
+        "tab_id": tab.tab_id,
+        "version": tab.version.version,
+        "rounds": new_rounds,
+        "round_count": tab.round_count,
+        "items": {item.name: {"quantity": item.quantity, "total": item.total} for item in order.items if item.name in names},
+        "subtotal": order.subtotal,
+        "taxes": order.taxes,
+        "discounts": order.discounts,
+        "total": order.total,
+    }
+
+
+def payment_diff(tab: Tab, credits: Dict[str, float]) -> dict:
+    """
+    Returns a payment and the balances it changed.
+    """
+    return {
+        "tab_id": tab.tab_id,
+        "version": tab.version.version,
+        "credits": credits,
+        "balances": {name: tab.friends[name].balance for name in credits if name in tab.friends},
+        "total_paid": tab.friends.total_paid,
+        "paid": tab.order.paid,
+        "paid_mode": tab.order.paid_mode,
+    }
+
+
+# Persistence
+def check_open(tab: Tab):
+    """
+    Rejects changes to a tab closed since it was looked up, maybe by another
+    worker.
+    """
+    if tab is not default_tab and tabs.tabs.get(tab.tab_id) is not tab:
+        raise HTTPException(status_code=404, detail=f"Tab {tab.tab_id} not found")
+
+
+@contextmanager
+def journal_write(tab: Optional[Tab] = None):
+    """
+    Runs a change as one storage transaction, after applying what other
+    workers journaled before it, so the change builds on the shared state.
+    Holds the registry's lock; tab locks are taken inside it.
+    """
+    if not storage.durable:
+        if tab is not None:
+            check_open(tab)
+        yield
+        return
+    with storage.transaction(), tabs.lock:
+        sync()
+        if tab is not None:
+            check_open(tab)
+        yield
+        # Nobody else can journal during the transaction, so every event so
+        # far was applied by sync() or written by this change.
+        tabs.last_event = storage.last_event_id()
+
+
+def sync():
+    """
+    Applies the events other workers journaled since this process last
+    looked, so every worker serves the same tabs and stock.
+    """
+    if not storage.durable:
+        return
+    with tabs.lock:
+        events = storage.events_since(tabs.last_event)
+        for event in events:
+            apply_event(event)
+        if events:
+            tabs.last_event = events[-1]["id"]
+            refresh_stock()
+
+
+async def sync_periodically(interval: float = SYNC_INTERVAL):
+    """
+    Syncs every ``interval`` seconds, so streams on this worker see changes
+    made on others.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sync)
+        except Exception as e:
+            log_message("Journal sync failed: %s", e, level=logging.ERROR)
+
+
+def apply_event(event: dict) -> Optional[Tab]:
+    """
+    Applies one journaled event to this process's tabs and publishes the
+    change. Returns the tab it changed, if it is still open. Called with the
+    registry's lock held.
+    """
+    kind, payload = event["kind"], event["payload"]
+    if kind == "fill":
+        return None
+    if kind == "close":
+        tabs.tabs.pop(event["tab_id"], None)
+        return None
+
+    tab = restore_tab(event["tab_id"])
+    with tab.lock:
+        if kind == "open":
+            tab.created = datetime.fromisoformat(payload["created"])
+        elif kind == "round":
+            items = payload["items"]
+            new_round = add_round(
+                tab,
+                [OrderRequest(name=i["name"], quantity=i["quantity"], user=i["person"]) for i in items],
+                {i["name"]: i["price"] for i in items},
+                datetime.fromisoformat(payload["created"]),
+                datetime.fromisoformat(payload.get("received", payload["created"])),
+            )
+            calculate_order_totals(tab)
+        elif kind == "payment":
+            for name, amount in payload["credits"].items():
+                tab.friends.credit(name, amount)
+            tab.order.paid_mode = PaidModeEnum(payload["mode"])
+            tab.order.paid = tab.friends.total_paid_cents >= to_cents(tab.order.total)
+        tab.pending_events += 1
+        tab.version.bump()
+        if kind == "round":
+            names = {i["name"] for i in payload["items"]}
+            broadcaster.publish(tab_topic(tab), "order", order_diff(tab, [new_round], names))
+        elif kind == "payment":
+            broadcaster.publish(tab_topic(tab), "payment", payment_diff(tab, payload["credits"]))
+    return tab
+
+
+def save_snapshot(tab: Tab):
+    # Called inside journal_write, where this process has applied every
+    # event journaled so far; later ones are left for replay.
+    storage.save_snapshot(tab.tab_id, tab.snapshot(), storage.last_event_id())
+    tab.pending_events = 0
+
+
+def checkpoint(tab: Tab, events: int = 1):
+    """
+    Count events journaled for a tab and snapshot it every SNAPSHOT_EVERY
+    events, trimming its live rounds as it does. Called with the tab's lock
+    held.
+    """
+    if not storage.durable:
+        return
+    tab.pending_events += events
+    if tab.pending_events >= SNAPSHOT_EVERY:
+        # The snapshot's transaction journals every round trimmed here, and
+        # moves them to the history.
+        tab.trim_rounds(LIVE_ROUNDS)
+        save_snapshot(tab)
+
+
+def snapshot_all():
+    """
+    Snapshot every tab with events since its last snapshot.
+    """
+    with journal_write():
+        for tab in [default_tab, *list(tabs.tabs.values())]:
+            with tab.lock:
+                if tab.pending_events:
+                    save_snapshot(tab)
+
+
+def open_tab(tab_id: Optional[str] = None) -> Tab:
+    """
+    Opens a tab and journals it, so every worker serves it.
+    """
+    with journal_write():
+        tab = tabs.create(tab_id)
+        storage.record_open(tab.tab_id, tab.created)
+    return tab
+
+
+def close_tab(tab_id: str, force: bool = False) -> Tab:
+    """
+    Closes a tab and moves its events to the history.
+    """
+    with journal_write():
+        tab = tabs.close(tab_id, force=force)
+        with tab.lock:
+            storage.archive_tab(tab_id)
+    return tab
+
+
+def tab_history(tab_id: str = None) -> List[dict]:
+    """
+    Returns every event journaled for a tab, open or closed, oldest first.
+    """
+    tab_id = tab_id or default_tab.tab_id
+    events = storage.history(tab_id)
+    if not events and tab_id != default_tab.tab_id:
+        tabs.get(tab_id)
+    return events
+
+
+def restore_tab(tab_id: str) -> Tab:
+    if tab_id == default_tab.tab_id:
+        return default_tab
+    return tabs.tabs.get(tab_id) or tabs.create(tab_id)
+
+
+def restore():
+    """
+    Rebuilds tabs from their latest snapshots and the events journaled after
+    them, then follows the journal from there.
+    """
+    with storage.transaction(), tabs.lock:
+        restored = {}
+        for tab_id, state in storage.load_snapshots().items():
+            tab = restore_tab(tab_id)
+            tab.restore_snapshot(state)
+            tab.version.bump()
+            restored[tab_id] = tab
+
+        for event in storage.load_events():
+            tab = apply_event(event)
+            if tab is not None:
+                restored[tab.tab_id] = tab
+        tabs.last_event = storage.last_event_id()
+
+        for tab in restored.values():
+            with tab.lock:
+                checkpoint(tab, 0)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.orders import OrderItem, PricingKindEnum, PricingPlanSummary, PricingRule
+from services.money import apply_rate, to_cents
+
+# JSON file with a list of pricing rules; the defaults apply when unset.
+PRICING_RULES = os.getenv("PRICING_RULES", "")
+
+DEFAULT_RULES = [
+    PricingRule(kind=PricingKindEnum.tax, name="VAT", rate=0.19),
+    PricingRule(kind=PricingKindEnum.volume, name="5% off", rate=0.05),
+    PricingRule(kind=PricingKindEnum.volume, name="10% off", rate=0.10, min_quantity=10),
+    PricingRule(kind=PricingKindEnum.volume, name="15% off", rate=0.15, min_quantity=20),
+]
+
+
+def minute_of_day(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class PriceBreakdown:
+    """
+    One evaluation of a plan, in cents. ``adjustments`` holds the amount
+    of every rule that applied, as (name, kind, cents).
+    """
+
+    __slots__ = ("subtotal", "taxes", "discounts", "adjustments")
+
+    def __init__(self, subtotal: int, taxes: int, discounts: int, adjustments: List[Tuple[str, PricingKindEnum, int]]):
+        self.subtotal = subtotal
+        self.taxes = taxes
+        self.discounts = discounts
+        self.adjustments = adjustments
+
+    @property
+    def total(self) -> int:
+        return self.subtotal + self.taxes - self.discounts
+
+    @property
+    def label(self) -> str:
+        return ", ".join(name for name, kind, _ in self.adjustments if kind != PricingKindEnum.tax)
+
+
+class PricingPlan:
+    """
+    Pricing rules compiled for evaluation: taxes, volume tiers sorted from
+    the highest, promotions indexed by beer and happy-hour windows in
+    minutes of the day.
+
+    Taxes apply to the subtotal. Discounts are all computed on list prices
+    and add up, capped at the subtotal: the best volume tier reached by
+    the number of beers ordered, each promotion whose beer reaches its
+    minimum quantity, and each happy hour on the rounds ordered during it.
+    """
+
+    def __init__(self, rules: Iterable[PricingRule]):
+        self.rules = list(rules)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Pricing rule names must be unique")
+
+        self.taxes: List[PricingRule] = []
+        self.tiers: List[PricingRule] = []
+        self.promos: Dict[str, List[PricingRule]] = {}
+        self.windows: List[Tuple[PricingRule, int, int, frozenset]] = []
+        for rule in self.rules:
+            if rule.kind == PricingKindEnum.tax:
+                self.taxes.append(rule)
+            elif rule.kind == PricingKindEnum.volume:
+                self.tiers.append(rule)
+            elif rule.kind == PricingKindEnum.promo:
+                if not rule.beer:
+                    raise ValueError(f"Promotion {rule.name} needs a beer")
+                self.promos.setdefault(rule.beer, []).append(rule)
+            else:
+                if not rule.start or not rule.end:
+                    raise ValueError(f"Happy hour {rule.name} needs a start and an end")
+                self.windows.append((rule, minute_of_day(rule.start), minute_of_day(rule.end), frozenset(rule.days)))
+        self.tiers.sort(key=lambda rule: rule.min_quantity, reverse=True)
+        self.tax_rate = sum(rule.rate for rule in self.taxes)
+        payload = json.dumps([rule.model_dump(mode="json") for rule in self.rules], sort_keys=True)
+        self.version = hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+    def summary(self) -> PricingPlanSummary:
+        return PricingPlanSummary(version=self.version, tax_rate=self.tax_rate, rules=self.rules)
+
+    def happy_hour(self, created: datetime) -> Optional[str]:
+        """
+        Return the name of the first happy hour running at ``created``.
+        """
+        minute = created.hour * 60 + created.minute
+        for rule, start, end, days in self.windows:
+            if days and created.weekday() not in days:
+                continue
+            if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+                return rule.name
+        return None
+
+    def evaluate(self, items: List[OrderItem], happy_hour: Dict[str, int]) -> PriceBreakdown:
+        """
+        Price an order from its per-beer aggregates and the subtotal ordered
+        during each happy hour.
+        """
+        subtotal = sum(to_cents(item.total) for item in items)
+        adjustments = []
+        taxes = 0
+        for rule in self.taxes:
+            amount = apply_rate(subtotal, rule.rate)
+            adjustments.append((rule.name, rule.kind, amount))
+            taxes += amount
+
+        quantity = sum(item.quantity for item in items)
+        for rule in self.tiers:
+            if quantity >= rule.min_quantity:
+                adjustments.append((rule.name, rule.kind, apply_rate(subtotal, rule.rate)))
+                break
+        for item in items:
+            for rule in self.promos.get(item.name, ()):
+                if item.quantity >= rule.min_quantity:
+                    adjustments.append((rule.name, rule.kind, apply_rate(to_cents(item.total), rule.rate)))
+        for rule, _, _, _ in self.windows:
+            if happy_hour.get(rule.name):
+                adjustments.append((rule.name, rule.kind, apply_rate(to_cents(happy_hour[rule.name]), rule.rate)))
+
+        discounts = min(subtotal, sum(amount for _, kind, amount in adjustments if kind != PricingKindEnum.tax))
+        return PriceBreakdown(subtotal, taxes, discounts, adjustments)
+
+
+class PriceCache:
+    """
+    A tab's last price breakdown and the inputs it was evaluated from.
+    """
+
+    __slots__ = ("key", "breakdown", "evaluations")
+
+    def __init__(self):
+        self.key = None
+        self.breakdown: Optional[PriceBreakdown] = None
+        self.evaluations = 0
+
+
+class PricingEngine:
+    """
+    Holds the compiled plan and prices tabs with it.
+
+    A tab is only evaluated again when the plan, its order's aggregates or
+    its happy-hour subtotals changed since its cached breakdown.
+    """
+
+    def __init__(self, rules: Iterable[PricingRule]):
+        self.plan = PricingPlan(rules)
+
+    def load(self, rules: Iterable[PricingRule]):
+        """
+        Compile and switch to new rules. Tabs are priced again on their next
+        order.
+        """
+        self.plan = PricingPlan(rules)
+
+    def price(self, tab) -> PriceBreakdown:
+        """
+        Return the tab's price breakdown, evaluating the plan only when its
+        inputs changed.
+        """
+        plan, cache = self.plan, tab.prices
+        key = (plan.version, tab.totals.version, tuple(tab.happy_hour.items()))
+        if key != cache.key:
+            cache.breakdown = plan.evaluate(tab.order.items, tab.happy_hour)
+            cache.key = key
+            cache.evaluations += 1
+        return cache.breakdown
+
+
+def load_rules(path: str) -> List[PricingRule]:
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(path) as f:
+        return [PricingRule.model_validate(rule) for rule in json.load(f)]
+
+
+pricing_engine = PricingEngine(load_rules(PRICING_RULES))
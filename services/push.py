@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import pydantic_core
+
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "64"))
+PUSH_HEARTBEAT = float(os.getenv("PUSH_HEARTBEAT", "15"))
+
+# Sent to a subscriber that fell behind, in place of the diffs it missed.
+RESYNC = b"event: resync\ndata: {}\n\n"
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def encode(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """
+    Encode one Server-Sent Events frame.
+    """
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return head.encode() + b"data: " + pydantic_core.to_json(data) + b"\n\n"
+
+
+class Subscription:
+    """
+    Bounded queue of encoded frames for one subscriber.
+
+    When the subscriber falls ``maxsize`` frames behind, its backlog is
+    replaced by a single ``resync`` frame, telling it to fetch the full
+    state again; publishers never wait for it.
+    """
+
+    def __init__(self, topics: Iterable[str], maxsize: int):
+        self.topics = frozenset(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: Optional[float] = None) -> bytes:
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broadcaster:
+    """
+    Fans out state changes to subscribers of their topic.
+
+    A change is encoded once however many subscribers receive it, and is
+    handed to each event loop with one thread-safe callback, so publishers
+    running in the threadpool never block on subscribers.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self.subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(topics, self.queue_size)
+        with self._lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any]):
+        """
+        Send ``data`` as an ``event`` frame to every subscriber of ``topic``.
+        """
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for subscription in self.subscriptions:
+            if topic in subscription.topics:
+                by_loop.setdefault(subscription.loop, []).append(subscription)
+        if not by_loop:
+            return
+        frame = encode(event, data, next(self._sequence))
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, subscriptions, frame)
+            except RuntimeError:
+                # The loop was closed; its subscribers are gone.
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+
+def deliver(subscriptions: List[Subscription], frame: bytes):
+    for subscription in subscriptions:
+        subscription.offer(frame)
+
+
+async def sse_stream(subscription: Subscription, initial: List[bytes], heartbeat: float = None):
+    """
+    Yield the initial frames, then every frame published to the
+    subscription, with a keep-alive comment when idle.
+    """
+    heartbeat = PUSH_HEARTBEAT if heartbeat is None else heartbeat
+    try:
+        for frame in initial:
+            yield frame
+        while True:
+            try:
+                yield await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+broadcaster = Broadcaster(queue_size=PUSH_QUEUE_SIZE)
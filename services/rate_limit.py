@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket limiter for async callers.
+
+    ``rate`` tokens are added per ``period`` seconds, up to ``capacity``.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0, capacity: float = None):
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate / self.period)
+
+    async def acquire(self, tokens: float = 1):
+        """
+        Wait until ``tokens`` are available and take them.
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) * self.period / self.rate)
+                self._refill()
+            self.tokens -= tokens
@@ -0,0 +1,73 @@
+import threading
+from typing import Dict, List, Tuple
+from fastapi import HTTPException
+from models.orders import Beer
+from services.stock_index import StockIndex
+
+
+class StockReserver:
+    """
+    All-or-nothing stock reservation with one lock per SKU.
+
+    Locks of a reservation are taken in name order, so concurrent orders
+    never deadlock and orders on different beers never wait on each other.
+    """
+
+    def __init__(self, stock_index: StockIndex):
+        self.stock_index = stock_index
+        self._locks: Dict[str, threading.Lock] = {}
+        self._catalog_lock = threading.Lock()
+
+    def lock_for(self, name: str) -> threading.Lock:
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks.setdefault(name, threading.Lock())
+        return lock
+
+    def _acquire(self, names: List[str]) -> List[threading.Lock]:
+        locks = [self.lock_for(name) for name in sorted(names)]
+        for lock in locks:
+            lock.acquire()
+        return locks
+
+    @staticmethod
+    def _release(locks: List[threading.Lock]):
+        for lock in reversed(locks):
+            lock.release()
+
+    def reserve(self, quantities: Dict[str, int]) -> Dict[str, int]:
+        """
+        Decrement every requested quantity, or none of them if any beer is
+        missing or short. Returns the unit price of each reserved beer.
+        """
+        for name, quantity in quantities.items():
+            if quantity <= 0:
+                raise HTTPException(status_code=400, detail=f"Invalid quantity for {name}")
+
+        locks = self._acquire(list(quantities))
+        try:
+            beers = {}
+            for name, quantity in quantities.items():
+                beer = self.stock_index.get(name)
+                if not beer:
+                    raise HTTPException(status_code=404, detail=f"Beer {name} not found")
+                if beer.quantity < quantity:
+                    raise HTTPException(status_code=400, detail=f"Not enough stock for {name}")
+                beers[name] = beer
+            for name, quantity in quantities.items():
+                beers[name].quantity -= quantity
+            return {name: beer.price for name, beer in beers.items()}
+        finally:
+            self._release(locks)
+
+    def add_beer(self, beer: Beer) -> Tuple[Beer, bool]:
+        """
+        Add a new beer unless another thread added it first. Returns the
+        stocked beer and whether it was created.
+        """
+        with self._catalog_lock:
+            existing = self.stock_index.get(beer.name)
+            if existing:
+                return existing, False
+            self.stock_index.add(beer)
+            return beer, True
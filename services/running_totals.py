@@ -0,0 +1,134 @@
+from typing import Dict, Optional
+from models.orders import Friend, Order, OrderItem
+from services.money import from_cents, to_cents
+
+
+class OrderTotals:
+    """
+    Running per-beer aggregates and subtotal of an order.
+
+    ``Order.items`` stays the serialized list; each beer has exactly one
+    ``OrderItem`` in it, updated in place as rounds are added. If the list
+    is replaced or changed from outside, the aggregates are rebuilt from it.
+    ``version`` changes whenever the aggregates do.
+    """
+
+    def __init__(self, order: Order):
+        self.order = order
+        self._items = None
+        self._size = -1
+        self._by_name: Dict[str, OrderItem] = {}
+        self.subtotal = 0
+        self._version = 0
+
+    def _sync(self):
+        items = self.order.items
+        if items is self._items and len(items) == self._size:
+            return
+        grouped: Dict[str, OrderItem] = {}
+        for item in items:
+            if item.name in grouped:
+                grouped[item.name].quantity += item.quantity
+                grouped[item.name].total += item.total
+            else:
+                grouped[item.name] = OrderItem(name=item.name, quantity=item.quantity, total=item.total)
+        self.order.items = list(grouped.values())
+        self._items = self.order.items
+        self._size = len(self._items)
+        self._by_name = grouped
+        self.subtotal = sum(item.total for item in self._items)
+        self._version += 1
+
+    def add(self, name: str, quantity: int, total: int):
+        """
+        Add an ordered line to its beer aggregate and to the subtotal.
+        """
+        self._sync()
+        item = self._by_name.get(name)
+        if item is None:
+            item = OrderItem(name=name, quantity=0, total=0)
+            self._items.append(item)
+            self._by_name[name] = item
+            self._size += 1
+        item.quantity += quantity
+        item.total += total
+        self.subtotal += total
+        self._version += 1
+
+    def get_subtotal(self) -> int:
+        self._sync()
+        return self.subtotal
+
+    @property
+    def version(self) -> int:
+        self._sync()
+        return self._version
+
+
+class FriendRegistry(dict):
+    """
+    Friends of an order keyed by name, with a running total of their balances.
+
+    Balances must change through ``credit`` so ``total_paid`` stays exact;
+    the total is kept in integer cents. Plain dicts assigned to a key are
+    validated into ``Friend`` models.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.total_paid_cents = 0
+        self.update(*args, **kwargs)
+
+    @property
+    def total_paid(self) -> float:
+        return from_cents(self.total_paid_cents)
+
+    def __setitem__(self, name: str, friend):
+        if not isinstance(friend, Friend):
+            friend = Friend.model_validate(friend)
+        previous = super().get(name)
+        if previous is not None:
+            self.total_paid_cents -= to_cents(previous.balance)
+        super().__setitem__(name, friend)
+        self.total_paid_cents += to_cents(friend.balance)
+
+    def __delitem__(self, name: str):
+        self.total_paid_cents -= to_cents(super().__getitem__(name).balance)
+        super().__delitem__(name)
+
+    def pop(self, name: str, *default):
+        if name in self:
+            friend = super().pop(name)
+            self.total_paid_cents -= to_cents(friend.balance)
+            return friend
+        return super().pop(name, *default)
+
+    def popitem(self):
+        name, friend = super().popitem()
+        self.total_paid_cents -= to_cents(friend.balance)
+        return name, friend
+
+    def setdefault(self, name: str, friend=None):
+        if name not in self:
+            self[name] = friend
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, friend in dict(*args, **kwargs).items():
+            self[name] = friend
+
+    def clear(self):
+        super().clear()
+        self.total_paid_cents = 0
+
+    def credit(self, name: str, amount: float) -> Optional[Friend]:
+        """
+        Add a payment to a friend's balance.
+        """
+        friend = self.get(name)
+        if friend is None:
+            return None
+        cents = to_cents(amount)
+        friend.balance = from_cents(to_cents(friend.balance) + cents)
+        self.total_paid_cents += cents
+        return friend
@@ -0,0 +1,43 @@
+from typing import Any, Optional
+import pydantic_core
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from models.orders import Order
+
+# Headers of the injected response that must not be copied to the real one.
+SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded by pydantic-core in one pass.
+
+    Models are serialized straight from their validated state, skipping
+    FastAPI's ``jsonable_encoder`` and response validation.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Build a FastJSONResponse, keeping headers set on the injected response
+    (e.g. ETag and Last-Modified).
+    """
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key not in SKIPPED_HEADERS}
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def order_view(order: Order, view: str = "full", round_count: Optional[int] = None):
+    """
+    Return the order itself, or without its round history for the summary view.
+    ``round_count`` counts rounds trimmed from the live order too.
+    """
+    if view == "summary":
+        summary = order.model_dump(exclude={"rounds"})
+        summary["round_count"] = len(order.rounds) if round_count is None else round_count
+        return summary
+    return order
@@ -0,0 +1,52 @@
+from typing import Dict, Optional
+from models.orders import Beer, Stock
+
+
+class StockIndex:
+    """
+    Name-keyed index over ``Stock.beers``.
+
+    The list stays the source of truth (it is what ``GET /beers/stock``
+    serializes); the index is rebuilt whenever the list is replaced or its
+    length changes behind our back, so lookups are O(1) on the hot path.
+    """
+
+    def __init__(self, stock: Stock):
+        self.stock = stock
+        self._beers = None
+        self._size = -1
+        self._by_name: Dict[str, Beer] = {}
+
+    def _sync(self):
+        beers = self.stock.beers
+        if beers is not self._beers or len(beers) != self._size:
+            self._by_name = {beer.name: beer for beer in beers}
+            self._beers = beers
+            self._size = len(beers)
+
+    def get(self, name: str) -> Optional[Beer]:
+        """
+        Return the beer with the given name, if stocked.
+        """
+        self._sync()
+        return self._by_name.get(name)
+
+    def price(self, name: str, default: int = 0) -> int:
+        beer = self.get(name)
+        return beer.price if beer else default
+
+    def add(self, beer: Beer):
+        """
+        Append a new beer to the stock and index it.
+        """
+        self._sync()
+        self.stock.beers.append(beer)
+        self._by_name[beer.name] = beer
+        self._size += 1
+
+    def __len__(self) -> int:
+        self._sync()
+        return self._size
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
@@ -0,0 +1,403 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from models.orders import Beer, Round, StockItem
+from services.reservations import StockReserver
+from services.stock_index import StockIndex
+
+# Tab id of stock fill events; generated and requested tab ids are never empty.
+STOCK_EVENTS = ""
+
+
+class StorageBackend:
+    """
+    Where stock, rounds and payments are kept.
+
+    The in-memory ``Stock`` model is always the object routes serialize;
+    backends keep it in sync with their own copy of the stock. Durable
+    backends also keep an append-only event log with per-tab snapshots,
+    which every process sharing the backend replays to serve the same tabs.
+    """
+
+    durable = False
+
+    def __init__(self, stock_index: StockIndex):
+        self.stock_index = stock_index
+        self.reserver = StockReserver(stock_index)
+
+    def fill(self, items: List[StockItem]):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of changes as one transaction that keeps other writers
+        out; nested blocks join the outer one.
+        """
+        yield
+
+    @staticmethod
+    def check_fill(items: List[StockItem]):
+        """
+        Reject fills that would take stock away; only orders do that.
+        """
+        for item in items:
+            if item.quantity <= 0:
+                raise HTTPException(status_code=400, detail=f"Invalid quantity for {item.name}")
+
+    def reserve(self, quantities: Dict[str, int]) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def refresh_stock(self) -> bool:
+        """
+        Bring the in-memory stock up to date with the backend's copy and
+        return whether it changed.
+        """
+        return False
+
+    def record_open(self, tab_id: str, created: datetime):
+        pass
+
+    def record_round(self, tab_id: str, new_round: Round, prices: Dict[str, int], received: datetime):
+        pass
+
+    def record_payment(self, tab_id: str, mode: str, credits: Dict[str, float]):
+        pass
+
+    def load_events(self) -> List[dict]:
+        return []
+
+    def events_since(self, event_id: int) -> List[dict]:
+        return []
+
+    def last_event_id(self) -> int:
+        return 0
+
+    def save_snapshot(self, tab_id: str, state: dict, event_id: int):
+        pass
+
+    def load_snapshots(self) -> Dict[str, dict]:
+        return {}
+
+    def archive_tab(self, tab_id: str):
+        pass
+
+    def history(self, tab_id: str) -> List[dict]:
+        return []
+
+    def close(self):
+        pass
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    Process-local storage: state lives only in the pydantic models.
+    """
+
+    def fill(self, items: List[StockItem]):
+        self.check_fill(items)
+        for item in items:
+            if item.price is None and item.name not in self.stock_index:
+                raise HTTPException(status_code=400, detail=f"Price is required for new beer {item.name}")
+
+        for item in items:
+            if item.name not in self.stock_index:
+                _, created = self.reserver.add_beer(Beer(name=item.name, price=item.price, quantity=item.quantity))
+                if created:
+                    continue
+            with self.reserver.lock_for(item.name):
+                existing_beer = self.stock_index.get(item.name)
+                existing_beer.quantity += item.quantity
+
+    def reserve(self, quantities: Dict[str, int]) -> Dict[str, int]:
+        return self.reserver.reserve(quantities)
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite storage of the stock, rounds and payments.
+
+    Changes run inside ``BEGIN IMMEDIATE`` transactions (see
+    ``transaction``), so reservations stay atomic across processes and
+    ``refresh_stock`` reads changes made by other processes. Tab openings,
+    rounds, payments, closings and stock fills are committed to an event
+    journal as they happen; other processes apply them with
+    ``events_since``, so tabs can be served by any worker. Each thread
+    reuses one connection in WAL mode, and statements are constant strings
+    so sqlite3 caches them.
+
+    ``events`` only holds what restore has to replay: saving a tab snapshot
+    moves the events it covers to ``history``, and closing a tab moves all
+    of its events there.
+    """
+
+    durable = True
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS beers ("
+        " name TEXT PRIMARY KEY, price INTEGER NOT NULL, quantity INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS events ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, tab_id TEXT NOT NULL, kind TEXT NOT NULL,"
+        " payload TEXT NOT NULL, created TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        " tab_id TEXT PRIMARY KEY, event_id INTEGER NOT NULL, payload TEXT NOT NULL, created TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS history ("
+        " id INTEGER PRIMARY KEY, tab_id TEXT NOT NULL, kind TEXT NOT NULL,"
+        " payload TEXT NOT NULL, created TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS history_tab ON history (tab_id, id)",
+    )
+    SELECT_BEER = "SELECT price, quantity FROM beers WHERE name = ?"
+    SELECT_BEERS = "SELECT name, price, quantity FROM beers ORDER BY rowid"
+    INSERT_BEER = "INSERT INTO beers (name, price, quantity) VALUES (?, ?, ?)"
+    ADD_QUANTITY = "UPDATE beers SET quantity = quantity + ? WHERE name = ?"
+    TAKE_QUANTITY = "UPDATE beers SET quantity = quantity - ? WHERE name = ? AND quantity >= ?"
+    INSERT_EVENT = "INSERT INTO events (tab_id, kind, payload, created) VALUES (?, ?, ?, ?)"
+    SELECT_EVENTS = "SELECT id, tab_id, kind, payload, created FROM events ORDER BY id"
+    SELECT_EVENTS_SINCE = (
+        "SELECT id, tab_id, kind, payload, created FROM events WHERE id > ?"
+        " UNION ALL SELECT id, tab_id, kind, payload, created FROM history WHERE id > ? ORDER BY id"
+    )
+    LAST_EVENT = "SELECT seq FROM sqlite_sequence WHERE name = 'events'"
+    SAVE_SNAPSHOT = "INSERT OR REPLACE INTO snapshots (tab_id, event_id, payload, created) VALUES (?, ?, ?, ?)"
+    SELECT_SNAPSHOTS = "SELECT tab_id, payload FROM snapshots"
+    DELETE_SNAPSHOT = "DELETE FROM snapshots WHERE tab_id = ?"
+    # Stock fills (tab_id '') are never replayed, so every compaction moves them.
+    ARCHIVE_EVENTS = (
+        "INSERT INTO history (id, tab_id, kind, payload, created)"
+        " SELECT id, tab_id, kind, payload, created FROM events WHERE tab_id IN (?, '') AND id <= ?"
+    )
+    DELETE_EVENTS = "DELETE FROM events WHERE tab_id IN (?, '') AND id <= ?"
+    SELECT_HISTORY = (
+        "SELECT kind, payload, created FROM ("
+        " SELECT id, kind, payload, created FROM history WHERE tab_id = ?"
+        " UNION ALL SELECT id, kind, payload, created FROM events WHERE tab_id = ?) ORDER BY id"
+    )
+
+    def __init__(self, stock_index: StockIndex, path: str):
+        super().__init__(stock_index)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+
+        connection = self.connection()
+        with connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+        self._load_stock()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False, cached_statements=64
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.depth = 0
+            self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block in one ``BEGIN IMMEDIATE`` transaction of this thread's
+        connection; nested blocks join the outer one. The in-memory stock is
+        read back from the database if the transaction rolls back.
+        """
+        connection = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield connection
+            finally:
+                self._local.depth -= 1
+            return
+
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield connection
+        except BaseException:
+            self._local.depth = 0
+            connection.execute("ROLLBACK")
+            self.refresh_stock()
+            raise
+        self._local.depth = 0
+        connection.execute("COMMIT")
+
+    def _load_stock(self):
+        """
+        Seed an empty database from the in-memory stock, or mirror the
+        persisted stock into it.
+        """
+        with self.transaction() as connection:
+            rows = connection.execute(self.SELECT_BEERS).fetchall()
+            if not rows:
+                connection.executemany(
+                    self.INSERT_BEER,
+                    [(beer.name, beer.price, beer.quantity) for beer in self.stock_index.stock.beers],
+                )
+        if rows:
+            self.stock_index.stock.beers = [Beer(name=name, price=price, quantity=quantity) for name, price, quantity in rows]
+
+    def _mirror(self, name: str, price: int, quantity: int):
+        beer, created = self.reserver.add_beer(Beer(name=name, price=price, quantity=quantity))
+        if not created:
+            with self.reserver.lock_for(name):
+                beer.price = price
+                beer.quantity = quantity
+
+    def fill(self, items: List[StockItem]):
+        self.check_fill(items)
+        with self.transaction() as connection:
+            for item in items:
+                updated = connection.execute(self.ADD_QUANTITY, (item.quantity, item.name)).rowcount
+                if not updated:
+                    if item.price is None:
+                        raise HTTPException(status_code=400, detail=f"Price is required for new beer {item.name}")
+                    connection.execute(self.INSERT_BEER, (item.name, item.price, item.quantity))
+            rows = {item.name: connection.execute(self.SELECT_BEER, (item.name,)).fetchone() for item in items}
+            self._append(STOCK_EVENTS, "fill", {"items": [item.model_dump() for item in items]})
+        for name, (price, quantity) in rows.items():
+            self._mirror(name, price, quantity)
+
+    def reserve(self, quantities: Dict[str, int]) -> Dict[str, int]:
+        for name, quantity in quantities.items():
+            if quantity <= 0:
+                raise HTTPException(status_code=400, detail=f"Invalid quantity for {name}")
+
+        with self.transaction() as connection:
+            rows = {}
+            for name, quantity in quantities.items():
+                if not connection.execute(self.TAKE_QUANTITY, (quantity, name, quantity)).rowcount:
+                    if connection.execute(self.SELECT_BEER, (name,)).fetchone() is None:
+                        raise HTTPException(status_code=404, detail=f"Beer {name} not found")
+                    raise HTTPException(status_code=400, detail=f"Not enough stock for {name}")
+                rows[name] = connection.execute(self.SELECT_BEER, (name,)).fetchone()
+        for name, (price, quantity) in rows.items():
+            self._mirror(name, price, quantity)
+        return {name: price for name, (price, _) in rows.items()}
+
+    def refresh_stock(self) -> bool:
+        changed = False
+        for name, price, quantity in self.connection().execute(self.SELECT_BEERS):
+            beer = self.stock_index.get(name)
+            if beer is None or beer.price != price or beer.quantity != quantity:
+                self._mirror(name, price, quantity)
+                changed = True
+        return changed
+
+    def _append(self, tab_id: str, kind: str, payload: dict) -> int:
+        with self.transaction() as connection:
+            return connection.execute(
+                self.INSERT_EVENT, (tab_id, kind, json.dumps(payload), datetime.now().isoformat())
+            ).lastrowid
+
+    def record_open(self, tab_id: str, created: datetime):
+        self._append(tab_id, "open", {"created": created.isoformat()})
+
+    def record_round(self, tab_id: str, new_round: Round, prices: Dict[str, int], received: datetime):
+        self._append(tab_id, "round", {
+            "created": new_round.created.isoformat(),
+            "received": received.isoformat(),
+            "items": [
+                {"name": item.name, "quantity": item.quantity, "person": item.person, "price": prices[item.name]}
+                for item in new_round.items
+            ],
+        })
+
+    def record_payment(self, tab_id: str, mode: str, credits: Dict[str, float]):
+        self._append(tab_id, "payment", {"mode": mode, "credits": credits})
+
+    @staticmethod
+    def _events(rows) -> List[dict]:
+        return [
+            {"id": event_id, "tab_id": tab_id, "kind": kind, "payload": json.loads(payload), "created": created}
+            for event_id, tab_id, kind, payload, created in rows
+        ]
+
+    def load_events(self) -> List[dict]:
+        return self._events(self.connection().execute(self.SELECT_EVENTS))
+
+    def events_since(self, event_id: int) -> List[dict]:
+        """
+        Return every event after ``event_id``, archived ones included, oldest first.
+        """
+        return self._events(self.connection().execute(self.SELECT_EVENTS_SINCE, (event_id, event_id)))
+
+    def last_event_id(self) -> int:
+        row = self.connection().execute(self.LAST_EVENT).fetchone()
+        return row[0] if row else 0
+
+    def _compact(self, tab_id: str, snapshot: Optional[dict], event_id: int):
+        """
+        Save or drop a tab's snapshot and move its events up to ``event_id``
+        to history.
+        """
+        with self.transaction() as connection:
+            if snapshot is None:
+                connection.execute(self.DELETE_SNAPSHOT, (tab_id,))
+            else:
+                connection.execute(
+                    self.SAVE_SNAPSHOT, (tab_id, event_id, json.dumps(snapshot), datetime.now().isoformat())
+                )
+            connection.execute(self.ARCHIVE_EVENTS, (tab_id, event_id))
+            connection.execute(self.DELETE_EVENTS, (tab_id, event_id))
+
+    def save_snapshot(self, tab_id: str, state: dict, event_id: int):
+        """
+        Snapshot a tab's derived state as of ``event_id``, the last event the
+        caller has applied. Later events, which other processes may have
+        journaled, are left to be replayed after it.
+        """
+        self._compact(tab_id, state, event_id)
+
+    def load_snapshots(self) -> Dict[str, dict]:
+        return {
+            tab_id: json.loads(payload)
+            for tab_id, payload in self.connection().execute(self.SELECT_SNAPSHOTS)
+        }
+
+    def archive_tab(self, tab_id: str):
+        """
+        Record that a tab was closed and move all of its events to history.
+        """
+        with self.transaction():
+            self._compact(tab_id, None, self._append(tab_id, "close", {}))
+
+    def history(self, tab_id: str) -> List[dict]:
+        """
+        Return every event of a tab, oldest first.
+        """
+        return [
+            {"kind": kind, "payload": json.loads(payload), "created": created}
+            for kind, payload, created in self.connection().execute(self.SELECT_HISTORY, (tab_id, tab_id))
+        ]
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+        self._connections.clear()
+        self._local = threading.local()
+
+
+def create_storage(stock_index: StockIndex, url: Optional[str] = None) -> StorageBackend:
+    """
+    Build the backend named by ``url`` (or ORDERS_STORAGE): ``memory`` or
+    ``sqlite:///path/to/file.db``.
+    """
+    url = url or os.getenv("ORDERS_STORAGE", "memory")
+    if url == "memory":
+        return InMemoryStorage(stock_index)
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(stock_index, url[len("sqlite:///"):])
+    raise ValueError(f"Unknown ORDERS_STORAGE: {url}")
@@ -0,0 +1,150 @@
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from fastapi import HTTPException
+from models.orders import Friend, Order, PaidModeEnum, TabSummary
+from services.ledger import FriendLedger
+from services.pricing import PriceCache
+from services.running_totals import FriendRegistry, OrderTotals
+from services.versioning import ResourceVersion
+
+# Id of the tab behind the tab-less /beers routes; never given to another tab.
+DEFAULT_TAB_ID = "default"
+
+
+def new_order() -> Order:
+    return Order(
+        created=datetime.now(),
+        paid=False,
+        subtotal=0,
+        taxes=0,
+        discounts=0,
+        discounts_str="",
+        total=0,
+        paid_mode=PaidModeEnum.unknown,
+        items=[],
+        rounds=[],
+    )
+
+
+class Tab:
+    """
+    One table's friends and order, with the running aggregates derived from them.
+    """
+
+    def __init__(self, tab_id: str, price_of: Callable[[str], int], version: Optional[ResourceVersion] = None):
+        self.tab_id = tab_id
+        self.created = datetime.now()
+        self.friends = FriendRegistry()
+        self.order = new_order()
+        self.totals = OrderTotals(self.order)
+        self.ledger = FriendLedger(self.order, price_of)
+        # Subtotal ordered during each happy hour, and the last price breakdown.
+        self.happy_hour: Dict[str, int] = {}
+        self.prices = PriceCache()
+        self.version = version or ResourceVersion(f"tab-{tab_id}")
+        # Serializes orders and payments of this tab only.
+        self.lock = threading.RLock()
+        # Rounds dropped from the live order, and events since the last snapshot.
+        self.trimmed = 0
+        self.pending_events = 0
+
+    @property
+    def round_count(self) -> int:
+        return self.trimmed + len(self.order.rounds)
+
+    def summary(self) -> TabSummary:
+        return TabSummary(
+            tab_id=self.tab_id,
+            created=self.created,
+            paid=self.order.paid,
+            total=self.order.total,
+            friends=len(self.friends),
+            rounds=self.round_count,
+        )
+
+    def trim_rounds(self, keep: int):
+        """
+        Keep only the ``keep`` most recent rounds in the live order.
+        """
+        excess = len(self.order.rounds) - keep
+        if excess > 0:
+            self.ledger.trim(excess)
+            self.trimmed += excess
+
+    def snapshot(self) -> dict:
+        """
+        Return the derived state of the tab as JSON-compatible data.
+        """
+        return {
+            "created": self.created.isoformat(),
+            "trimmed": self.trimmed,
+            "order": self.order.model_dump(mode="json"),
+            "friends": {name: friend.balance for name, friend in self.friends.items()},
+            "consumption": {name: self.ledger.consumed(name) for name in self.friends},
+            "happy_hour": dict(self.happy_hour),
+        }
+
+    def restore_snapshot(self, state: dict):
+        """
+        Replace the tab's state with a snapshot, keeping the live objects.
+        """
+        order = Order.model_validate(state["order"])
+        for field in Order.model_fields:
+            setattr(self.order, field, getattr(order, field))
+        self.friends.clear()
+        for name, balance in state["friends"].items():
+            self.friends[name] = Friend(name=name, balance=balance)
+        self.ledger.restore(state["consumption"])
+        self.happy_hour = dict(state.get("happy_hour", {}))
+        self.created = datetime.fromisoformat(state["created"])
+        self.trimmed = state["trimmed"]
+
+
+class TabRegistry:
+    """
+    Open tabs keyed by id. Tabs share the stock but nothing else.
+    """
+
+    def __init__(self, price_of: Callable[[str], int]):
+        self.price_of = price_of
+        self.tabs: Dict[str, Tab] = {}
+        # Makes checking an id and opening its tab one step, and applying
+        # journal events to the tabs one step per event.
+        self.lock = threading.RLock()
+        # Id of the last journal event the tabs reflect.
+        self.last_event = 0
+
+    def create(self, tab_id: Optional[str] = None) -> Tab:
+        """
+        Open a new tab, with a generated id unless one is given.
+        """
+        tab_id = tab_id or uuid.uuid4().hex
+        if tab_id == DEFAULT_TAB_ID:
+            raise HTTPException(status_code=409, detail=f"Tab id {tab_id} is reserved")
+        with self.lock:
+            if tab_id in self.tabs:
+                raise HTTPException(status_code=409, detail=f"Tab {tab_id} already exists")
+            tab = Tab(tab_id, self.price_of)
+            self.tabs[tab_id] = tab
+        return tab
+
+    def get(self, tab_id: str) -> Tab:
+        tab = self.tabs.get(tab_id)
+        if tab is None:
+            raise HTTPException(status_code=404, detail=f"Tab {tab_id} not found")
+        return tab
+
+    def list(self) -> List[TabSummary]:
+        return [tab.summary() for tab in list(self.tabs.values())]
+
+    def close(self, tab_id: str, force: bool = False) -> Tab:
+        """
+        Close a tab. Unpaid tabs with orders are only closed when forced.
+        """
+        tab = self.get(tab_id)
+        if not force and tab.order.rounds and not tab.order.paid:
+            raise HTTPException(status_code=400, detail=f"Tab {tab_id} has an unpaid bill")
+        self.tabs.pop(tab_id, None)
+        return tab
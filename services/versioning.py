@@ -0,0 +1,72 @@
+import threading
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from fastapi import Request, Response
+
+# Distinguishes versions of different processes so ETags never collide
+# across restarts or workers.
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class ResourceVersion:
+    """
+    Monotonic version counter of a resource, used to build validators.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.version = 0
+        self.modified_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """
+        Mark the resource as changed.
+        """
+        with self._lock:
+            self.version += 1
+            self.modified_at = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def etag(self) -> str:
+        return f'"{self.name}-{BOOT_ID}-{self.version}"'
+
+    def headers(self) -> dict:
+        return {
+            "ETag": self.etag(),
+            "Last-Modified": format_datetime(self.modified_at, usegmt=True),
+        }
+
+
+stock_version = ResourceVersion("stock")
+order_version = ResourceVersion("order")
+books_version = ResourceVersion("books")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Compare an If-None-Match header with an ETag (weak comparison).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, response: Response, version: ResourceVersion) -> Optional[Response]:
+    """
+    Set validators on the response and return a 304 response when the
+    client already holds the current representation.
+    """
+    headers = version.headers()
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,60 @@
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List
+import httpx
+from tenacity import wait_exponential_jitter
+from models.nyt import PrefetchJobStatus
+from services.rate_limit import AsyncTokenBucket
+
+REQUESTS_PER_MINUTE = float(os.getenv("NYT_REQUESTS_PER_MINUTE", "5"))
+PREFETCH_ATTEMPTS = int(os.getenv("NYT_PREFETCH_ATTEMPTS", "4"))
+MAX_JOBS = int(os.getenv("NYT_PREFETCH_MAX_JOBS", "1000"))
+
+rate_limiter = AsyncTokenBucket(rate=REQUESTS_PER_MINUTE, period=60)
+backoff = wait_exponential_jitter(initial=1, max=30, jitter=1)
+
+jobs: Dict[str, PrefetchJobStatus] = {}
+
+
+def create_prefetch_job(fetch_jobs: Dict[str, str]) -> PrefetchJobStatus:
+    """
+    Register a new prefetch job over the fetch queue jobs of its genres.
+    """
+    job = PrefetchJobStatus(
+        job_id=uuid.uuid4().hex,
+        state="pending",
+        total=len(fetch_jobs),
+        jobs=fetch_jobs,
+        created=datetime.now(),
+    )
+    jobs[job.job_id] = job
+    # Progress lives on the fetch queue, so the registry is bounded by count.
+    prune_jobs(jobs, MAX_JOBS, ())
+    return job
+
+
+def get_prefetch_job(job_id: str):
+    return jobs.get(job_id)
+
+
+def prune_jobs(registry: Dict[str, object], max_jobs: int, unfinished: Iterable[str]) -> List[str]:
+    """
+    Forget the oldest finished jobs of a registry beyond ``max_jobs``;
+    unfinished ones are kept. Returns the ids of the forgotten jobs.
+    """
+    finished = [job_id for job_id, job in registry.items() if job.state not in unfinished]
+    pruned = finished[:max(0, len(registry) - max_jobs)]
+    for job_id in pruned:
+        del registry[job_id]
+    return pruned
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Retry network errors, 429 and 5xx responses; other client errors are final.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt
+from models.nyt import FetchJobStatus, PrefetchJobStatus
+from services.logs import log_message
+from services.metrics import track_task
+from services.nyt_service import NYTService
+from tasks import bulk_prefetch
+
+QUEUE_WORKERS = int(os.getenv("NYT_QUEUE_WORKERS", "2"))
+QUEUE_PATH = os.getenv("NYT_QUEUE_PATH", "")
+QUEUE_MAX_JOBS = int(os.getenv("NYT_QUEUE_MAX_JOBS", "1000"))
+
+UNFINISHED = ("queued", "running")
+
+nyt_service = NYTService()
+
+
+class JobStore:
+    """
+    SQLite table of fetch jobs, so queued and interrupted jobs outlive the
+    worker that accepted them.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS fetch_jobs ("
+        " job_id TEXT PRIMARY KEY, state TEXT NOT NULL, payload TEXT NOT NULL)"
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(self.SCHEMA)
+
+    def save(self, job_id: str, state: str, payload: str):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO fetch_jobs (job_id, state, payload) VALUES (?, ?, ?)",
+                (job_id, state, payload),
+            )
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM fetch_jobs WHERE job_id = ?", (job_id,))
+
+    def load(self) -> List[FetchJobStatus]:
+        with self._lock:
+            rows = self._connection.execute("SELECT payload FROM fetch_jobs ORDER BY rowid").fetchall()
+        return [FetchJobStatus.model_validate_json(payload) for payload, in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class FetchQueue:
+    """
+    In-process priority queue of NYT book fetches served by a pool of async
+    workers.
+
+    Jobs are deduplicated by genre while queued or running, higher
+    ``priority`` runs first, and retries back off on the event loop instead
+    of sleeping in a threadpool thread. With a ``path`` every job is kept in
+    SQLite and unfinished jobs are queued again on start; the SQLite work runs
+    on one writer thread, in order, off the event loop.
+    """
+
+    def __init__(self, workers: int = 2, path: Optional[str] = None, max_jobs: int = 1000):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.store = JobStore(path) if path else None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch-jobs") if path else None
+        self.jobs: "OrderedDict[str, FetchJobStatus]" = OrderedDict()
+        self.active: Dict[str, str] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """
+        Start the workers on the running loop and queue unfinished jobs.
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        if self.store is not None:
+            for job in await self._in_writer(self.store.load):
+                self.jobs[job.job_id] = job
+        for job in self.jobs.values():
+            if job.state in UNFINISHED:
+                job.state = "queued"
+                self.active[job.genre] = job.job_id
+                self._put(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        log_message("Fetch queue started with %d workers.", self.workers)
+
+    async def stop(self):
+        """
+        Stop the workers. Jobs they were running stay unfinished and are
+        queued again on the next start.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def close(self):
+        if self.store is not None:
+            self._writer.shutdown(wait=True)
+            self.store.close()
+
+    async def enqueue(self, genre: str, priority: int = 0) -> Tuple[FetchJobStatus, bool]:
+        """
+        Queue a fetch of ``genre`` and return the job and whether it is new.
+        A genre already queued or running returns its existing job, raised
+        to the higher of both priorities.
+        """
+        job_id = self.active.get(genre)
+        if job_id is not None:
+            job = self.jobs[job_id]
+            if job.state == "queued" and priority > job.priority:
+                job.priority = priority
+                self._put(job)
+                await self._save(job)
+            return job, False
+
+        job = FetchJobStatus(
+            job_id=uuid.uuid4().hex,
+            genre=genre,
+            priority=priority,
+            state="queued",
+            created=datetime.now(),
+        )
+        self.jobs[job.job_id] = job
+        self.active[genre] = job.job_id
+        self._put(job)
+        await self._save(job)
+        await self._prune()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[FetchJobStatus]:
+        return self.jobs.get(job_id)
+
+    def list(self, state: Optional[str] = None) -> List[FetchJobStatus]:
+        return [job for job in self.jobs.values() if state is None or job.state == state]
+
+    def progress(self, prefetch: PrefetchJobStatus) -> PrefetchJobStatus:
+        """
+        Progress of a bulk prefetch, read from the queue jobs of its genres.
+        """
+        completed, failed, started, finished = [], {}, False, []
+        for genre, job_id in prefetch.jobs.items():
+            job = self.jobs.get(job_id)
+            if job is None:
+                failed[genre] = f"Job {job_id} is no longer tracked"
+                continue
+            started = started or job.state != "queued"
+            if job.state == "completed":
+                completed.append(genre)
+            elif job.state == "failed":
+                failed[genre] = job.error
+            if job.finished is not None:
+                finished.append(job.finished)
+        if len(completed) + len(failed) == prefetch.total:
+            state = "failed" if failed and not completed else "completed"
+        else:
+            state = "running" if started else "pending"
+        return prefetch.model_copy(update={
+            "state": state,
+            "completed": completed,
+            "failed": failed,
+            "finished": max(finished) if state in ("completed", "failed") and finished else None,
+        })
+
+    async def join(self):
+        """
+        Wait until every queued job has been processed.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _put(self, job: FetchJobStatus):
+        # Raising a priority queues the job twice; the stale entry is
+        # skipped because the job is no longer queued when it comes up.
+        if self._queue is not None:
+            self._queue.put_nowait((-job.priority, next(self._sequence), job.job_id))
+
+    async def _in_writer(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, function, *args)
+
+    async def _save(self, job: FetchJobStatus):
+        # The job is serialized here, on the loop, before it can change again.
+        if self.store is not None:
+            await self._in_writer(self.store.save, job.job_id, job.state, job.model_dump_json())
+
+    async def _prune(self):
+        for job_id in bulk_prefetch.prune_jobs(self.jobs, self.max_jobs, UNFINISHED):
+            if self.store is not None:
+                await self._in_writer(self.store.delete, job_id)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None and job.state == "queued":
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: FetchJobStatus):
+        job.state = "running"
+        job.started = datetime.now()
+        await self._save(job)
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(bulk_prefetch.PREFETCH_ATTEMPTS),
+                wait=bulk_prefetch.backoff,
+                retry=retry_if_exception(bulk_prefetch.is_retryable),
+                reraise=True,
+            ):
+                with attempt:
+                    job.attempts = attempt.retry_state.attempt_number
+                    await bulk_prefetch.rate_limiter.acquire()
+                    with track_task("fetch_books"):
+                        books = await nyt_service.afetch_books(job.genre)
+            job.state = "completed"
+            job.books = len(books)
+            log_message('%d books for genre "%s" processed correctly.', len(books), job.genre, job_id=job.job_id)
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            log_message("Error to fetch books for genre '%s': %s", job.genre, e, level=logging.ERROR, job_id=job.job_id)
+        job.finished = datetime.now()
+        self.active.pop(job.genre, None)
+        await self._save(job)
+
+
+fetch_queue = FetchQueue(workers=QUEUE_WORKERS, path=QUEUE_PATH or None, max_jobs=QUEUE_MAX_JOBS)
@@ -0,0 +1,51 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from benchmarks import load, micro, money
+from benchmarks.common import compare_baseline, percentile, save_baseline
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_percentile(self):
+        """
+        Test nearest-rank percentiles.
+        """
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.5), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_compare_flags_regressions(self):
+        """
+        Test that latencies going up and throughput going down both regress.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            with redirect_stdout(io.StringIO()):
+                save_baseline(path, {"a_ms": 10.0, "b_per_s": 100.0})
+                self.assertTrue(compare_baseline(path, {"a_ms": 11.0, "b_per_s": 95.0}, 0.2))
+                self.assertFalse(compare_baseline(path, {"a_ms": 13.0, "b_per_s": 100.0}, 0.2))
+                self.assertFalse(compare_baseline(path, {"a_ms": 10.0, "b_per_s": 70.0}, 0.2))
+
+    def test_suite_runs(self):
+        """
+        Smoke test the benchmarks at a tiny scale.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            with redirect_stdout(io.StringIO()), patch.object(micro, "SCALES", [(5, 2, 3)]), \
+                    patch.object(micro, "CALLS", 5):
+                self.assertEqual(micro.main(["--save-baseline", path]), 0)
+                self.assertEqual(
+                    load.main(["--requests", "40", "--concurrency", "4", "--tabs", "2", "--nyt-delay", "0"]), 0
+                )
+            with redirect_stdout(io.StringIO()), patch.object(money, "GROUP_SIZES", [3]), \
+                    patch.object(money, "SPLITS", 2):
+                self.assertEqual(money.main([]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import logging
+import queue
+import unittest
+from unittest.mock import patch
+from services import logs
+from services.logs import DeferredQueueHandler, JSONFormatter, log_message, request_id_var
+
+
+class CountingArg:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "formatted"
+
+
+class TestLogs(unittest.TestCase):
+    def setUp(self):
+        self.queue = queue.SimpleQueue()
+        self.logger = logging.getLogger("cometa-test")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.handlers = [DeferredQueueHandler(self.queue)]
+        patcher = patch.object(logs, "logger", self.logger)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_structured_record(self):
+        """
+        Test that records carry the request id and fields as JSON.
+        """
+        token = request_id_var.set("req-1")
+        try:
+            log_message("Order %s placed", 7, latency_ms=1.5)
+        finally:
+            request_id_var.reset(token)
+
+        entry = json.loads(JSONFormatter().format(self.queue.get_nowait()))
+        self.assertEqual(entry["message"], "Order 7 placed")
+        self.assertEqual(entry["request_id"], "req-1")
+        self.assertEqual(entry["latency_ms"], 1.5)
+        self.assertEqual(entry["level"], "INFO")
+
+    def test_formatting_is_lazy(self):
+        """
+        Test that arguments are neither formatted by the caller nor at all
+        when the level is disabled.
+        """
+        argument = CountingArg()
+        log_message("Skipped %s", argument, level=logging.DEBUG)
+        self.assertTrue(self.queue.empty())
+
+        log_message("Queued %s", argument)
+        record = self.queue.get_nowait()
+        self.assertEqual(argument.calls, 0)
+        self.assertEqual(record.getMessage(), "Queued formatted")
+        self.assertEqual(argument.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
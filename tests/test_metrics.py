@@ -0,0 +1,64 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import httpx
+from fastapi.testclient import TestClient
+from main import app
+from services.metrics import Counter, Histogram
+from services.nyt_service import NYTService
+
+client = TestClient(app)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_sums_thread_shards(self):
+        """
+        Test that lock-free per-thread updates add up exactly.
+        """
+        counter = Counter("test_total", "Test counter.", ("kind",))
+
+        def work(_):
+            for _ in range(1000):
+                counter.inc(kind="a")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, range(8)))
+        self.assertEqual(counter.values()[("a",)], 8000)
+        self.assertIn('test_total{kind="a"} 8000', counter.expose())
+
+    def test_histogram_buckets(self):
+        """
+        Test that histogram buckets are cumulative in the exposition.
+        """
+        histogram = Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        exposed = histogram.expose()
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', exposed)
+        self.assertIn('test_seconds_bucket{le="1"} 2', exposed)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', exposed)
+        self.assertIn("test_seconds_count 3", exposed)
+
+    def test_metrics_endpoint(self):
+        """
+        Test that requests and NYT calls show up at /metrics.
+        """
+        NYTService().reset_genres()
+        handler = httpx.MockTransport(lambda request: httpx.Response(503))
+        with patch.object(NYTService, "async_client", httpx.AsyncClient(base_url=NYTService.BASE_URL, transport=handler)):
+            client.get("/nyt/genres")
+        client.get("/beers/stock")
+        client.get("/beers/tabs/missing")
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.text
+        self.assertIn('http_requests_total{method="GET",route="/beers/stock",status="200"}', body)
+        self.assertIn('http_requests_total{method="GET",route="/beers/tabs/{tab_id}",status="404"}', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/beers/stock"}', body)
+        self.assertIn('nyt_requests_total{endpoint="genres",outcome="503"}', body)
+        self.assertIn("http_requests_in_flight", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
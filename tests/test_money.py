@@ -0,0 +1,105 @@
+import random
+import unittest
+from fractions import Fraction
+from fastapi.testclient import TestClient
+from main import app
+from models.orders import Beer, PaidModeEnum
+from services.money import allocate, apply_rate, split_bill, split_equal, to_cents
+from services.orders_service import current_order, friends, stock, tabs
+
+client = TestClient(app)
+
+
+class TestMoney(unittest.TestCase):
+    def test_conversions_round_half_up(self):
+        """
+        Test that amounts and rates round half up to whole cents.
+        """
+        self.assertEqual(to_cents(115), 11500)
+        self.assertEqual(to_cents(0.1 + 0.2), 30)
+        self.assertEqual(to_cents(1.005), 101)
+        self.assertEqual(apply_rate(250, 0.19), 48)
+        self.assertEqual(apply_rate(50, 0.05), 3)
+
+    def test_allocate_properties(self):
+        """
+        Test on random inputs that shares add up exactly, stay within a cent
+        of their exact proportion and do not depend on anything but the input.
+        """
+        rng = random.Random(24)
+        for _ in range(500):
+            weights = [rng.choice([0, rng.randint(1, 50_000)]) for _ in range(rng.randint(1, 40))]
+            total = rng.randint(-100_000, 100_000)
+            shares = allocate(total, weights)
+            self.assertEqual(sum(shares), total)
+            self.assertEqual(shares, allocate(total, list(weights)))
+            weight_sum = sum(weights) or len(weights)
+            for share, weight in zip(shares, weights if sum(weights) else [1] * len(weights)):
+                self.assertLess(abs(share - Fraction(total * weight, weight_sum)), 1)
+
+    def test_split_equal(self):
+        """
+        Test that equal shares differ by at most one cent, earlier ones first.
+        """
+        self.assertEqual(split_equal(1000, 3), [334, 333, 333])
+        rng = random.Random(7)
+        for _ in range(200):
+            total, count = rng.randint(0, 10**7), rng.randint(1, 500)
+            shares = split_equal(total, count)
+            self.assertEqual(sum(shares), total)
+            self.assertLessEqual(max(shares) - min(shares), 1)
+
+    def test_split_bill_matches_order_amounts(self):
+        """
+        Test that taxes and discounts are split without losing a cent.
+        """
+        shares = split_bill({"a": 11500, "b": 24000, "c": 0}, apply_rate(35500, 0.19), apply_rate(35500, 0.10))
+        self.assertEqual(sum(share["taxes"] for share in shares.values()), 6745)
+        self.assertEqual(sum(share["discounts"] for share in shares.values()), 3550)
+        self.assertEqual(sum(share["total"] for share in shares.values()), 35500 + 6745 - 3550)
+        self.assertEqual(shares["c"]["total"], 0)
+
+
+class TestBillInCents(unittest.TestCase):
+    def setUp(self):
+        stock.beers = [
+            Beer(name="Corona", price=115, quantity=100),
+            Beer(name="Quilmes", price=120, quantity=100),
+        ]
+        stock.last_updated = None
+        current_order.items = []
+        current_order.rounds = []
+        current_order.subtotal = 0
+        current_order.total = 0
+        current_order.paid = False
+        current_order.paid_mode = PaidModeEnum.unknown
+        friends.clear()
+        tabs.tabs.clear()
+
+    tearDown = setUp
+
+    def test_shares_add_up_and_equal_split_settles(self):
+        """
+        Test that friend shares add up to the bill to the cent and that an
+        equal split of an amount not divisible by the group settles it.
+        """
+        names = ["Tony Stark", "Peter Parker", "Bruce Banner"]
+        client.post("/beers/order", json=[
+            {"name": "Corona", "quantity": 1, "user": names[0]},
+            {"name": "Quilmes", "quantity": 2, "user": names[1]},
+            {"name": "Corona", "quantity": 3, "user": names[2]},
+        ])
+        shares = client.get("/beers/bill/friends").json()["friends"]
+        self.assertEqual(sum(to_cents(share["total"]) for share in shares), to_cents(current_order.total))
+
+        response = client.put("/beers/pay", json={"mode": "equal"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(current_order.paid)
+        shares = client.get("/beers/bill/friends").json()["friends"]
+        paid = sorted(to_cents(share["paid"]) for share in shares)
+        self.assertEqual(sum(paid), to_cents(current_order.total))
+        self.assertLessEqual(paid[-1] - paid[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,24 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
+import httpx
 from fastapi.testclient import TestClient
 from main import app
+from services.book_disk_cache import BookDiskCache
+from services.book_store import BookRecord, BookStore
+from services.cache import AsyncTTLCache
 from services.nyt_service import NYTService
+from services.rate_limit import AsyncTokenBucket
+from services.versioning import books_version
+from tasks import bulk_prefetch
+from tasks.fetch_queue import FetchQueue
+from tenacity import wait_none
 
 client = TestClient(app)
 nyt_service = NYTService()
@@ -14,27 +30,280 @@ class TestNYTAPI(unittest.TestCase):
         Reset the cache before each test to ensure isolation.
         """
         nyt_service.reset_books()
+        nyt_service.reset_genres()
 
-    @patch("services.nyt_service.requests.get")
-    def test_fetch_genres(self, mock_get):
+    def mock_async_client(self, handler):
+        """
+        Build an async client that answers NYT calls with the given handler.
+        """
+        return httpx.AsyncClient(
+            base_url=NYTService.BASE_URL, transport=httpx.MockTransport(handler)
+        )
+
+    def test_fetch_genres(self):
         """
         Test the /genres endpoint for fetching available genres.
         """
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "results": [
-                {"list_name": "Fiction", "display_name": "Fiction"},
-                {"list_name": "Nonfiction", "display_name": "Nonfiction"},
-            ]
-        }
-        mock_get.return_value = mock_response
+        def handler(request):
+            return httpx.Response(200, json={
+                "results": [
+                    {"list_name": "Fiction", "display_name": "Fiction"},
+                    {"list_name": "Nonfiction", "display_name": "Nonfiction"},
+                ]
+            })
 
-        response = client.get("/nyt/genres")
+        with patch.object(NYTService, "async_client", self.mock_async_client(handler)):
+            response = client.get("/nyt/genres")
         self.assertEqual(response.status_code, 200)
         self.assertIn("genres", response.json())
         self.assertEqual(len(response.json()["genres"]), 2)
 
+    def test_async_client_is_shared(self):
+        """
+        Test that every NYTService instance reuses the same pooled client.
+        """
+        shared = self.mock_async_client(lambda request: httpx.Response(200, json={}))
+        with patch.object(NYTService, "async_client", shared):
+            self.assertIs(NYTService().get_async_client(), shared)
+            self.assertIs(nyt_service.get_async_client(), shared)
+
+    def test_genres_are_cached(self):
+        """
+        Test that repeated /genres calls hit NYT only once within the TTL.
+        """
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"results": [{"list_name": "Fiction"}]})
+
+        with patch.object(NYTService, "async_client", self.mock_async_client(handler)):
+            client.get("/nyt/genres")
+            response = client.get("/nyt/genres")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 1)
+
+    def test_cache_coalesces_concurrent_misses(self):
+        """
+        Test that concurrent misses share a single loader call.
+        """
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ["Fiction"]
+
+        async def run():
+            cache = AsyncTTLCache(loader, ttl=60)
+            return await asyncio.gather(*(cache.get() for _ in range(500)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result == ["Fiction"] for result in results))
+
+    def test_cache_serves_stale_while_revalidating(self):
+        """
+        Test that an expired value is served while one refresh runs.
+        """
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return f"v{len(calls)}"
+
+        async def run():
+            cache = AsyncTTLCache(loader, ttl=0, stale_ttl=60)
+            first = await cache.get()
+            stale = await asyncio.gather(*(cache.get() for _ in range(10)))
+            await cache._inflight
+            return first, stale, await cache.get()
+
+        first, stale, refreshed = asyncio.run(run())
+        self.assertEqual(first, "v1")
+        self.assertEqual(set(stale), {"v1"})
+        self.assertEqual(refreshed, "v2")
+
+    @patch("services.nyt_service.requests.get")
+    def test_view_books_by_genre_and_author(self, mock_get):
+        """
+        Test that /books filters by genre and author and paginates by rank.
+        """
+        def books_for(genre):
+            mock_response = MagicMock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"results": {"books": [
+                {"book_uri": f"nyt://{genre}/{rank}", "rank": rank, "title": f"{genre} {rank}",
+                 "author": "Author A" if rank == 1 else "Author B",
+                 "description": "", "amazon_product_url": ""}
+                for rank in (3, 1, 2)
+            ]}}
+            return mock_response
+
+        for genre in ("fiction", "nonfiction"):
+            mock_get.return_value = books_for(genre)
+            nyt_service.fetch_books(genre)
+
+        first = client.get("/nyt/books", params={"genre": "fiction", "limit": 2}).json()
+        self.assertEqual([book["rank"] for book in first["books"]], [1, 2])
+        second = client.get(
+            "/nyt/books", params={"genre": "fiction", "limit": 2, "cursor": first["next_cursor"]}
+        ).json()
+        self.assertEqual([book["rank"] for book in second["books"]], [3])
+        self.assertIsNone(second["next_cursor"])
+
+        by_author = client.get("/nyt/books", params={"author": "author a"}).json()
+        self.assertEqual(
+            {book["book_uri"] for book in by_author["books"]},
+            {"nyt://fiction/1", "nyt://nonfiction/1"},
+        )
+        listing = client.get("/nyt/books")
+        self.assertEqual(len(listing.json()["books"]), 6)
+        self.assertEqual(
+            client.get("/nyt/books", headers={"If-None-Match": listing.headers["ETag"]}).status_code,
+            304,
+        )
+        nyt_service.reset_books()
+        self.assertEqual(
+            client.get("/nyt/books", headers={"If-None-Match": listing.headers["ETag"]}).status_code,
+            200,
+        )
+
+    def test_bulk_prefetch(self):
+        """
+        Test that /books/bulk queues every genre on the fetch queue and
+        reports their progress.
+        """
+        attempts = {}
+
+        def handler(request):
+            genre = request.url.path.rsplit("/", 1)[-1].removesuffix(".json")
+            attempts[genre] = attempts.get(genre, 0) + 1
+            if genre == "flaky" and attempts[genre] == 1:
+                return httpx.Response(503)
+            if genre == "missing":
+                return httpx.Response(404)
+            return httpx.Response(200, json={"results": {"books": [
+                {"book_uri": f"nyt://{genre}/1", "rank": 1, "title": genre, "author": "A",
+                 "description": "", "amazon_product_url": ""}
+            ]}})
+
+        with patch.object(NYTService, "async_client", self.mock_async_client(handler)), \
+                patch("tasks.bulk_prefetch.rate_limiter", AsyncTokenBucket(rate=1000, period=1)), \
+                patch("tasks.bulk_prefetch.backoff", wait_none()):
+            with TestClient(app) as lifespan_client:
+                response = lifespan_client.post("/nyt/books/bulk", json={"genres": ["fiction", "flaky", "missing"]})
+                self.assertEqual(response.status_code, 202)
+                fetch_jobs = response.json()["jobs"]
+                self.assertEqual(sorted(fetch_jobs), ["fiction", "flaky", "missing"])
+                for _ in range(100):
+                    status = lifespan_client.get(f"/nyt/books/bulk/{response.json()['job_id']}").json()
+                    if status["state"] in ("completed", "failed"):
+                        break
+                    time.sleep(0.01)
+                queued = lifespan_client.get(f"/nyt/books/jobs/{fetch_jobs['flaky']}").json()
+
+        self.assertEqual(status["state"], "completed")
+        self.assertEqual(sorted(status["completed"]), ["fiction", "flaky"])
+        self.assertIn("missing", status["failed"])
+        self.assertEqual(attempts["flaky"], 2)
+        self.assertEqual(attempts["missing"], 1)
+        self.assertEqual(queued["attempts"], 2)
+        self.assertIsNotNone(status["finished"])
+        self.assertEqual(client.get("/nyt/books/bulk/unknown").status_code, 404)
+
+    def test_bulk_prefetch_jobs_are_bounded(self):
+        """
+        Test that only the newest bulk jobs are remembered, and that the
+        shared prune helper never forgets unfinished jobs.
+        """
+        bulk_prefetch.jobs.clear()
+        with patch("tasks.bulk_prefetch.MAX_JOBS", 2):
+            created = [bulk_prefetch.create_prefetch_job({"fiction": "queued-job"}).job_id for _ in range(3)]
+        self.assertEqual(list(bulk_prefetch.jobs), created[1:])
+
+        running = bulk_prefetch.jobs[created[1]]
+        running.state = "running"
+        self.assertEqual(bulk_prefetch.prune_jobs(bulk_prefetch.jobs, 1, ("running",)), [created[2]])
+        self.assertEqual(list(bulk_prefetch.jobs), [created[1]])
+        bulk_prefetch.jobs.clear()
+
+    def test_fetch_queue_priority_dedup_and_durability(self):
+        """
+        Test that the fetch queue runs higher priorities first, fetches a
+        genre once however often it is queued, retries with backoff and
+        picks up unfinished jobs from SQLite after a restart.
+        """
+        fetched = []
+
+        def handler(request):
+            genre = request.url.path.rsplit("/", 1)[-1].removesuffix(".json")
+            fetched.append(genre)
+            if genre == "flaky" and fetched.count("flaky") == 1:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"results": {"books": [
+                {"book_uri": f"nyt://{genre}/1", "rank": 1, "title": genre, "author": "A",
+                 "description": "", "amazon_product_url": ""}
+            ]}})
+
+        async def run(path):
+            queue = FetchQueue(workers=1, path=path)
+            fiction, created = await queue.enqueue("fiction")
+            self.assertTrue(created)
+            await queue.enqueue("flaky", priority=1)
+            await queue.enqueue("history", priority=5)
+            again, created = await queue.enqueue("fiction", priority=9)
+            self.assertFalse(created)
+            self.assertEqual(again.job_id, fiction.job_id)
+            await queue.start()
+            await queue.join()
+            await queue.stop()
+            await queue.enqueue("poetry")
+            queue.close()
+
+            restarted = FetchQueue(workers=1, path=path)
+            await restarted.start()
+            await restarted.join()
+            await restarted.stop()
+            restarted.close()
+            return queue, restarted
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(NYTService, "async_client", self.mock_async_client(handler)), \
+                patch("tasks.bulk_prefetch.rate_limiter", AsyncTokenBucket(rate=1000, period=1)), \
+                patch("tasks.bulk_prefetch.backoff", wait_none()):
+            queue, restarted = asyncio.run(run(os.path.join(directory, "jobs.db")))
+
+        self.assertEqual(fetched, ["fiction", "history", "flaky", "flaky", "poetry"])
+        jobs = {job.genre: job for job in restarted.list()}
+        self.assertEqual({genre: job.state for genre, job in jobs.items()},
+                         {"fiction": "completed", "history": "completed", "flaky": "completed", "poetry": "completed"})
+        self.assertEqual(jobs["flaky"].attempts, 2)
+        self.assertEqual(jobs["fiction"].priority, 9)
+
+    def test_fetch_books_endpoint_queues_job(self):
+        """
+        Test that POST /books queues one job per genre and reports its status.
+        """
+        def handler(request):
+            return httpx.Response(200, json={"results": {"books": []}})
+
+        with patch.object(NYTService, "async_client", self.mock_async_client(handler)), \
+                patch("tasks.bulk_prefetch.rate_limiter", AsyncTokenBucket(rate=1000, period=1)):
+            with TestClient(app) as lifespan_client:
+                first = lifespan_client.post("/nyt/books", json={"genre": "fiction"}).json()
+                job_id = first["job_id"]
+                for _ in range(100):
+                    status = lifespan_client.get(f"/nyt/books/jobs/{job_id}").json()
+                    if status["state"] == "completed":
+                        break
+                    time.sleep(0.01)
+                self.assertEqual(status["state"], "completed")
+                self.assertEqual(status["books"], 0)
+                listed = lifespan_client.get("/nyt/books/jobs", params={"state": "completed"}).json()
+                self.assertIn(job_id, [job["job_id"] for job in listed["jobs"]])
+                self.assertEqual(lifespan_client.get("/nyt/books/jobs/unknown").status_code, 404)
+
     @patch("services.nyt_service.requests.get")
     def test_get_logs(self, mock_get):
         """
@@ -48,6 +317,269 @@ class TestNYTAPI(unittest.TestCase):
         self.assertIn("logs", response.json())
         self.assertGreater(len(response.json()["logs"]), 0)
 
+    def test_logs_tail_cursor_and_filters(self):
+        """
+        Test tail reading, cursors, level and time filters and NDJSON streaming.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "execution.log")
+            with open(path, "w") as log_file:
+                for minute in range(10):
+                    level = "ERROR" if minute % 3 == 0 else "INFO"
+                    log_file.write(json.dumps({
+                        "time": f"2025-01-01T10:{minute:02d}:00+00:00", "level": level, "message": f"entry {minute}",
+                    }) + "\n")
+                log_file.write('{"time": "2025-01-01T10:10')
+
+            with patch("routers.nyt.LOG_FILE", path):
+                tail = client.get("/nyt/logs", params={"limit": 3}).json()
+                self.assertEqual([json.loads(line)["message"] for line in tail["logs"]],
+                                 ["entry 7", "entry 8", "entry 9"])
+                older = client.get("/nyt/logs", params={"limit": 3, "before": tail["before"]}).json()
+                self.assertEqual(json.loads(older["logs"][0])["message"], "entry 4")
+
+                with open(path, "a") as log_file:
+                    log_file.write(':00+00:00", "level": "INFO", "message": "entry 10"}\n')
+                follow = client.get("/nyt/logs", params={"cursor": tail["cursor"]}).json()
+                self.assertEqual([json.loads(line)["message"] for line in follow["logs"]], ["entry 10"])
+                self.assertEqual(follow["cursor"], f"{os.stat(path).st_ino}:{os.path.getsize(path)}")
+                self.assertFalse(follow["reset"])
+                self.assertEqual(client.get("/nyt/logs", params={"cursor": "x:1"}).status_code, 400)
+
+                errors = client.get("/nyt/logs", params={"level": "error", "since": "2025-01-01T10:01:00Z"}).json()
+                self.assertEqual([json.loads(line)["message"] for line in errors["logs"]],
+                                 ["entry 3", "entry 6", "entry 9"])
+                self.assertEqual(client.get("/nyt/logs", params={"level": "loud"}).status_code, 400)
+
+                streamed = client.get("/nyt/logs", params={"format": "ndjson", "cursor": 0, "limit": 2})
+                self.assertEqual(streamed.headers["content-type"], "application/x-ndjson")
+                self.assertEqual([json.loads(line)["message"] for line in streamed.text.splitlines()],
+                                 ["entry 0", "entry 1"])
+
+    def test_logs_cursor_survives_rotation(self):
+        """
+        Test that a cursor into a rotated or truncated log restarts at the
+        top of the new file instead of skipping lines or splitting one.
+        """
+        def write(path, messages, mode="a"):
+            with open(path, mode) as log_file:
+                for message in messages:
+                    log_file.write(json.dumps({"level": "INFO", "message": message}) + "\n")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "execution.log")
+            write(path, [f"old {i}" for i in range(20)], "w")
+            with patch("routers.nyt.LOG_FILE", path):
+                cursor = client.get("/nyt/logs", params={"limit": 1}).json()["cursor"]
+
+                # Rotated: the new file grows past the old offset.
+                os.rename(path, path + ".1")
+                write(path, [f"new {i}" for i in range(40)], "w")
+                follow = client.get("/nyt/logs", params={"cursor": cursor, "limit": 2}).json()
+                self.assertTrue(follow["reset"])
+                self.assertEqual([json.loads(line)["message"] for line in follow["logs"]], ["new 0", "new 1"])
+                follow = client.get("/nyt/logs", params={"cursor": follow["cursor"], "limit": 1}).json()
+                self.assertEqual((json.loads(follow["logs"][0])["message"], follow["reset"]), ("new 2", False))
+
+                # Truncated in place: same file, offset past its end.
+                cursor = client.get("/nyt/logs", params={"limit": 1}).json()["cursor"]
+                write(path, ["after truncate"], "w")
+                follow = client.get("/nyt/logs", params={"cursor": cursor}).json()
+                self.assertTrue(follow["reset"])
+                self.assertEqual([json.loads(line)["message"] for line in follow["logs"]], ["after truncate"])
+
+    @patch("services.nyt_service.requests.get")
+    def test_disk_cache_warm_start(self, mock_get):
+        """
+        Test that fetched lists survive a restart through the disk cache.
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"results": {"published_date": "2025-01-05", "books": [
+            {"book_uri": "nyt://fiction/1", "rank": 1, "title": "Fiction 1", "author": "Author A",
+             "description": "", "amazon_product_url": ""}
+        ]}}
+        mock_get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(NYTService, "DISK_CACHE_PATH", os.path.join(directory, "books.db")):
+                try:
+                    nyt_service.fetch_books("fiction")
+                    self.assertEqual(NYTService.disk_cache.stats()["entries"], 1)
+
+                    # A fresh process starts with an empty store and warms lazily.
+                    NYTService.disk_cache.close()
+                    NYTService.disk_cache = None
+                    NYTService.disk_cache_loaded = False
+                    NYTService.books_cache.clear()
+                    books = client.get("/nyt/books", params={"genre": "fiction"}).json()["books"]
+                    self.assertEqual([book["title"] for book in books], ["Fiction 1"])
+
+                    # Disk hits for a list already in memory keep the ETags.
+                    version = books_version.version
+                    nyt_service.fetch_books("fiction")
+                    asyncio.run(nyt_service.afetch_books("fiction"))
+                    self.assertEqual(mock_get.call_count, 1)
+                    self.assertEqual(books_version.version, version)
+                    nyt_service.fetch_books("fiction", refresh=True)
+                    self.assertEqual(mock_get.call_count, 2)
+                finally:
+                    NYTService.disk_cache.close()
+                    NYTService.disk_cache = None
+
+    @patch("services.nyt_service.requests.get")
+    def test_readers_wait_for_the_disk_cache_warm_up(self, mock_get):
+        """
+        Test that a reader arriving while another one warms the store from
+        the disk cache gets the warmed books, not an empty store.
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"results": {"published_date": "2025-01-05", "books": [
+            {"book_uri": "nyt://fiction/1", "rank": 1, "title": "Fiction 1", "author": "Author A",
+             "description": "", "amazon_product_url": ""}
+        ]}}
+        mock_get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(NYTService, "DISK_CACHE_PATH", os.path.join(directory, "books.db")):
+                try:
+                    nyt_service.fetch_books("fiction")
+                    NYTService.disk_cache_loaded = False
+                    NYTService.books_cache.clear()
+                    load_all = NYTService.disk_cache.load_all
+
+                    def slow_load_all():
+                        time.sleep(0.2)
+                        return load_all()
+
+                    with patch.object(NYTService.disk_cache, "load_all", slow_load_all):
+                        warming = threading.Thread(target=nyt_service.warm_books)
+                        warming.start()
+                        time.sleep(0.05)
+                        books, _ = nyt_service.query_books(genre="fiction")
+                        warming.join()
+                    self.assertEqual([book.title for book in books], ["Fiction 1"])
+                finally:
+                    NYTService.disk_cache.close()
+                    NYTService.disk_cache = None
+
+    def test_book_store_evicts_least_recently_used_genre(self):
+        """
+        Test that the book store stays within its bounds by evicting the
+        genre read least recently, and that records share interned strings.
+        """
+        def records(genre):
+            return [
+                BookRecord(f"nyt://{genre}/{rank}", rank, f"{genre} {rank}", "Author " + "A",
+                           "", f"https://www.amazon.com/dp/{genre}{rank}?tag=NYTBSREV-20", genre)
+                for rank in (1, 2)
+            ]
+
+        store = BookStore(max_entries=4)
+        store.replace_genre("fiction", records("fiction"))
+        store.replace_genre("history", records("history"))
+        store.query(genre="fiction")
+        store.replace_genre("poetry", records("poetry"))
+
+        self.assertEqual(store.genres(), ["fiction", "poetry"])
+        self.assertEqual(store.query(author="author a")[0][0].genre, "fiction")
+        footprint = store.footprint()
+        self.assertEqual((footprint["books"], footprint["genres"], footprint["evictions"]), (4, 2, 1))
+        self.assertEqual(footprint["bytes"], sum(book.size for book in store))
+
+        fiction, poetry = store.get("nyt://fiction/1"), store.get("nyt://poetry/1")
+        self.assertIs(fiction.author, poetry.author)
+        self.assertIs(fiction.url_prefix, poetry.url_prefix)
+        book = poetry.to_response()
+        self.assertEqual(book.amazon_url, "https://www.amazon.com/dp/poetry1?tag=NYTBSREV-20")
+
+        store.replace_genre("essays", records("essays") + records("drama"))
+        self.assertEqual(store.genres(), ["essays"])
+
+        stats = client.get("/nyt/books/stats").json()
+        self.assertEqual(set(stats), {"books", "genres", "bytes", "evictions"})
+        self.assertIn('nyt_books_cache{measure="bytes"}', client.get("/metrics").text)
+
+    def test_book_store_concurrent_reads_and_replacements(self):
+        """
+        Test that reads running while genres are replaced and evicted never
+        see the indexes half updated.
+        """
+        store = BookStore(max_entries=60)
+        genres = [f"genre-{index}" for index in range(6)]
+        stop, errors = threading.Event(), []
+
+        def replace():
+            rank = 0
+            while not stop.is_set():
+                rank += 1
+                genre = genres[rank % len(genres)]
+                store.replace_genre(genre, [
+                    BookRecord(f"nyt://{genre}/{rank}/{i}", i, "Title", f"Author {i % 3}", "", None, genre)
+                    for i in range(20)
+                ])
+
+        def read():
+            while not stop.is_set():
+                try:
+                    store.query(author="author 1")
+                    store.query(genre=genres[0], limit=5)
+                    store.query(limit=10, offset=5)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=replace)] + [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(store.footprint()["bytes"], sum(book.size for book in store))
+
+    def test_book_store_lru_order_under_concurrent_reads(self):
+        """
+        Test that reads reordering the LRU from many threads leave every
+        genre listed once and evict in recency order.
+        """
+        store = BookStore(max_entries=6)
+        for genre in ("fiction", "history", "poetry"):
+            store.replace_genre(genre, [
+                BookRecord(f"nyt://{genre}/{rank}", rank, "Title", "Author", "", None, genre) for rank in (1, 2)
+            ])
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: store.query(genre=("fiction", "history", "poetry")[i % 3]), range(3000)))
+        self.assertEqual(sorted(store.genres()), ["fiction", "history", "poetry"])
+
+        store.query(genre="history")
+        store.query(genre="fiction")
+        store.replace_genre("drama", [BookRecord("nyt://drama/1", 1, "Title", "Author", "", None, "drama")])
+        self.assertEqual(store.genres(), ["history", "fiction", "drama"])
+
+    def test_disk_cache_expiry_and_eviction(self):
+        """
+        Test that the disk cache drops expired lists and evicts the least
+        recently used ones once full.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BookDiskCache(os.path.join(directory, "books.db"), ttl=60, max_entries=2)
+            try:
+                cache.put("fiction", "2025-01-05", [{"rank": 1}])
+                cache.put("fiction", "2025-01-12", [{"rank": 2}])
+                self.assertEqual(cache.get("fiction"), ("2025-01-12", [{"rank": 2}]))
+
+                cache.put("history", "2025-01-12", [{"rank": 1}])
+                self.assertEqual(cache.stats()["entries"], 2)
+                self.assertEqual(set(cache.load_all()), {"fiction", "history"})
+                self.assertEqual(cache.load_all()["fiction"][0], "2025-01-12")
+
+                cache.put("poetry", "2025-01-12", [{"rank": 1}], ttl=-1)
+                self.assertIsNone(cache.get("poetry"))
+            finally:
+                cache.close()
+
     def tearDown(self):
         """
         Cleanup after each test.
@@ -1,8 +1,21 @@
+import asyncio
+import json
+import threading
+import time
 import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from models.orders import Beer
+from models.orders import Beer, OrderRequest, PaidModeEnum, PayRequest
 from main import app
-from services.orders_service import stock, current_order, friends
+from routers.orders import event_stream
+from services import orders_service
+from services.orders_service import stock, current_order, default_tab, friends, tabs
+from services.idempotency import IdempotencyCache
+from services.push import Broadcaster
+from services.serialization import json_response
+from services.tabs import Tab
 
 client = TestClient(app)
 
@@ -21,10 +34,13 @@ class TestOrderAPI(unittest.TestCase):
         stock.last_updated = None
         current_order.items = []
         current_order.rounds = []
+        default_tab.trimmed = 0
         current_order.subtotal = 0
         current_order.total = 0
         current_order.paid = False
+        current_order.paid_mode = PaidModeEnum.unknown
         friends.clear()
+        tabs.tabs.clear()
 
     def test_list_beers(self):
         """
@@ -34,6 +50,363 @@ class TestOrderAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("beers", response.json())
 
+    def test_stock_conditional_get(self):
+        """
+        Test that /stock answers If-None-Match with 304 until the stock changes.
+        """
+        etag = client.get("/beers/stock").headers["ETag"]
+        cached = client.get("/beers/stock", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+        client.post("/beers/fill-stock", json={"items": [{"name": "Corona", "quantity": 1}]})
+        refreshed = client.get("/beers/stock", headers={"If-None-Match": etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed.headers["ETag"], etag)
+        self.assertIn("Last-Modified", refreshed.headers)
+
+    def test_bill_etag_changes_with_orders(self):
+        """
+        Test that placing an order invalidates the bill ETag.
+        """
+        etag = client.get("/beers/bill").headers["ETag"]
+        client.post("/beers/order", json=[{"name": "Corona", "quantity": 1, "user": "Tony Stark"}])
+        self.assertEqual(
+            client.get("/beers/bill", headers={"If-None-Match": etag}).status_code, 200
+        )
+
+    def test_fill_stock_adds_new_beer(self):
+        """
+        Test that new beers need a price and can be ordered right away, that
+        fills cannot take stock away and that restocking keeps the price.
+        """
+        response = client.post("/beers/fill-stock", json={"items": [{"name": "Aguila", "quantity": 4}]})
+        self.assertEqual(response.status_code, 400)
+        response = client.post("/beers/fill-stock", json={"items": [{"name": "Corona", "quantity": -100}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stock.beers[0].quantity, 5)
+        client.post("/beers/fill-stock", json={"items": [{"name": "Corona", "quantity": 1, "price": 1}]})
+        self.assertEqual((stock.beers[0].quantity, stock.beers[0].price), (6, 115))
+
+        response = client.post(
+            "/beers/fill-stock", json={"items": [{"name": "Aguila", "quantity": 4, "price": 100}]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stock"]["beers"][-1]["name"], "Aguila")
+
+        response = client.post("/beers/order", json=[{"name": "Aguila", "quantity": 4, "user": "Tony Stark"}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stock.beers[-1].quantity, 0)
+
+    def test_running_totals_across_rounds(self):
+        """
+        Test that rounds accumulate into one item per beer and an exact subtotal.
+        """
+        for _ in range(3):
+            client.post("/beers/order", json=[
+                {"name": "Corona", "quantity": 1, "user": "Tony Stark"},
+                {"name": "Quilmes", "quantity": 2, "user": "Peter Parker"},
+            ])
+        items = {item.name: item for item in current_order.items}
+        self.assertEqual(len(current_order.items), 2)
+        self.assertEqual(items["Corona"].quantity, 3)
+        self.assertEqual(items["Quilmes"].total, 720)
+        self.assertEqual(current_order.subtotal, 3 * 115 + 720)
+
+    def test_memory_backend_keeps_every_round(self):
+        """
+        Test that the memory backend never trims live rounds, since it has no
+        journal to keep them in.
+        """
+        with patch.object(orders_service, "LIVE_ROUNDS", 2):
+            for _ in range(4):
+                client.post("/beers/order", json=[{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}])
+        self.assertEqual(len(current_order.rounds), 4)
+        self.assertEqual(default_tab.round_count, 4)
+        self.assertEqual(len(client.get("/beers/bill").json()["rounds"]), 4)
+        self.assertEqual(current_order.subtotal, 4 * 120)
+        self.assertEqual(client.get("/beers/bill/friends").json()["friends"][0]["consumption"], 4 * 120)
+
+    def test_bill_by_friend(self):
+        """
+        Test that each friend's share follows their own consumption.
+        """
+        for _ in range(2):
+            client.post("/beers/order", json=[
+                {"name": "Corona", "quantity": 1, "user": "Tony Stark"},
+                {"name": "Quilmes", "quantity": 2, "user": "Peter Parker"},
+            ])
+        shares = {share["name"]: share for share in client.get("/beers/bill/friends").json()["friends"]}
+        self.assertEqual(shares["Tony Stark"]["consumption"], 230)
+        self.assertEqual(shares["Peter Parker"]["consumption"], 480)
+        self.assertAlmostEqual(
+            shares["Tony Stark"]["total"] + shares["Peter Parker"]["total"], current_order.total, places=1
+        )
+
+        client.put("/beers/pay", json={"mode": "individual", "friend": "Tony Stark"})
+        shares = {share["name"]: share for share in client.get("/beers/bill/friends").json()["friends"]}
+        self.assertAlmostEqual(shares["Tony Stark"]["due"], 0)
+        self.assertAlmostEqual(shares["Tony Stark"]["paid"], shares["Tony Stark"]["total"])
+
+    def test_tabs_are_independent(self):
+        """
+        Test that tabs keep their own friends and orders but share the stock.
+        """
+        first = client.post("/beers/tabs", json={"tab_id": "table-1"}).json()["tab_id"]
+        second = client.post("/beers/tabs").json()["tab_id"]
+        self.assertEqual(client.post("/beers/tabs", json={"tab_id": "table-1"}).status_code, 409)
+        self.assertEqual(client.post("/beers/tabs", json={"tab_id": "default"}).status_code, 409)
+
+        client.post(f"/beers/tabs/{first}/order", json=[{"name": "Corona", "quantity": 2, "user": "Tony Stark"}])
+        client.post(f"/beers/tabs/{second}/order", json=[{"name": "Corona", "quantity": 3, "user": "Bruce Banner"}])
+
+        self.assertEqual(stock.beers[0].quantity, 0)
+        self.assertEqual(len(current_order.rounds), 0)
+        self.assertEqual(client.get(f"/beers/tabs/{first}/bill").json()["subtotal"], 230)
+        shares = client.get(f"/beers/tabs/{second}/bill/friends").json()["friends"]
+        self.assertEqual([share["name"] for share in shares], ["Bruce Banner"])
+        self.assertEqual(len(client.get("/beers/tabs").json()["tabs"]), 2)
+
+        self.assertEqual(client.delete(f"/beers/tabs/{first}").status_code, 400)
+        response = client.put(f"/beers/tabs/{first}/pay", json={"mode": "equal"})
+        self.assertEqual(response.json()["bill_status"], "Paid")
+        self.assertEqual(client.delete(f"/beers/tabs/{first}").status_code, 200)
+        self.assertEqual(client.get(f"/beers/tabs/{first}").status_code, 404)
+
+    def test_concurrent_tabs_with_one_id(self):
+        """
+        Test that only one of many concurrent requests opening the same tab
+        id succeeds, so no tab is replaced.
+        """
+        init = Tab.__init__
+
+        def slow_init(tab, *args, **kwargs):
+            time.sleep(0.05)
+            init(tab, *args, **kwargs)
+
+        with patch.object(Tab, "__init__", slow_init), ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: client.post("/beers/tabs", json={"tab_id": "table-1"}), range(4)))
+        self.assertEqual(sorted(response.status_code for response in responses), [201, 409, 409, 409])
+
+    def test_summary_view(self):
+        """
+        Test that ?view=summary leaves out the round history.
+        """
+        for _ in range(3):
+            client.post("/beers/order", json=[{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}])
+
+        full = client.get("/beers/bill").json()
+        summary = client.get("/beers/bill", params={"view": "summary"}).json()
+        self.assertEqual(len(full["rounds"]), 3)
+        self.assertNotIn("rounds", summary)
+        self.assertEqual(summary["round_count"], 3)
+        self.assertEqual(summary["total"], full["total"])
+
+        response = client.post(
+            "/beers/order", params={"view": "summary"},
+            json=[{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}],
+        )
+        self.assertEqual(response.json()["order"]["round_count"], 4)
+        self.assertEqual(client.get("/beers/bill", params={"view": "all"}).status_code, 422)
+
+    def test_batch_order(self):
+        """
+        Test that buffered rounds are applied together, or not at all.
+        """
+        rounds = [
+            {"items": [{"name": "Corona", "quantity": 1, "user": "Tony Stark"}],
+             "created": "2025-01-01T20:00:00"},
+            {"items": [
+                {"name": "Corona", "quantity": 1, "user": "Tony Stark"},
+                {"name": "Quilmes", "quantity": 2, "user": "Peter Parker"},
+            ]},
+        ]
+        response = client.post("/beers/order/batch", json={"rounds": rounds})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([result["subtotal"] for result in body["rounds"]], [115, 355])
+        self.assertEqual(body["totals"]["subtotal"], 470)
+        self.assertEqual(body["totals"]["round_count"], 2)
+        self.assertEqual(current_order.rounds[0].created.year, 2025)
+        self.assertEqual(stock.beers[0].quantity, 3)
+
+        too_many = [{"items": [{"name": "Corona", "quantity": 2, "user": "Tony Stark"}]}] * 2
+        response = client.post("/beers/order/batch", json={"rounds": too_many})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stock.beers[0].quantity, 3)
+        self.assertEqual(len(current_order.rounds), 2)
+
+        version = client.get("/beers/bill").headers["ETag"]
+        response = client.post("/beers/order/batch", json={"rounds": []})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get("/beers/bill").headers["ETag"], version)
+
+    def test_stream_pushes_diffs(self):
+        """
+        Test that a tab stream starts with the bill and stock and then
+        receives compact diffs of orders, payments and stock changes.
+        """
+        def parse(frame):
+            fields = dict(line.split(": ", 1) for line in frame.decode().splitlines() if line)
+            return fields["event"], json.loads(fields["data"])
+
+        async def run():
+            tab = tabs.create("screens")
+            response = await event_stream(tab, True)
+            frames = response.body_iterator
+            received = [parse(await anext(frames)), parse(await anext(frames))]
+            await asyncio.to_thread(
+                orders_service.update_stock_and_order,
+                [OrderRequest(name="Corona", quantity=2, user="Tony Stark")], tab,
+            )
+            await asyncio.to_thread(orders_service.pay_bill, PayRequest(mode="equal"), tab)
+            for _ in range(3):
+                received.append(parse(await anext(frames)))
+            await frames.aclose()
+            return received
+
+        received = asyncio.run(run())
+        self.assertEqual([event for event, _ in received], ["bill", "stock", "stock", "order", "payment"])
+        self.assertEqual(received[1][1]["beers"]["Corona"]["quantity"], 5)
+        self.assertEqual(received[2][1]["beers"], {"Corona": {"price": 115, "quantity": 3}})
+        order = received[3][1]
+        self.assertEqual(order["items"], {"Corona": {"quantity": 2, "total": 230}})
+        self.assertEqual(order["round_count"], 1)
+        self.assertTrue(received[4][1]["paid"])
+        self.assertEqual(list(received[4][1]["balances"]), ["Tony Stark"])
+        self.assertEqual(orders_service.broadcaster.subscriptions, [])
+
+    def test_stream_diffs_arrive_in_version_order(self):
+        """
+        Test that concurrent orders on one tab publish their diffs in
+        version order, so the last diff holds the latest totals.
+        """
+        stock.beers[1].quantity = 100
+
+        async def run():
+            tab = tabs.create("rush")
+            subscription = orders_service.broadcaster.subscribe([orders_service.tab_topic(tab)])
+
+            def order(_):
+                orders_service.update_stock_and_order([OrderRequest(name="Quilmes", quantity=1, user="Tony Stark")], tab)
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                await asyncio.get_running_loop().run_in_executor(None, lambda: list(pool.map(order, range(40))))
+            await asyncio.sleep(0.05)
+            frames = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            orders_service.broadcaster.unsubscribe(subscription)
+            return tab, [json.loads(frame.decode().split("data: ", 1)[1]) for frame in frames]
+
+        tab, diffs = asyncio.run(run())
+        versions = [diff["version"] for diff in diffs]
+        self.assertEqual(len(versions), 40)
+        self.assertEqual(versions, sorted(versions))
+        self.assertEqual(diffs[-1]["total"], tab.order.total)
+
+    def test_stream_waits_for_tab_lock_off_the_loop(self):
+        """
+        Test that opening a stream on a busy tab does not block the event loop.
+        """
+        tab = tabs.create("busy")
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with tab.lock:
+                held.set()
+                release.wait(2)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+
+        async def run():
+            opening = asyncio.create_task(event_stream(tab, False))
+            start = time.perf_counter()
+            await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - start
+            release.set()
+            frames = (await opening).body_iterator
+            await anext(frames)
+            await frames.aclose()
+            return elapsed
+
+        self.assertLess(asyncio.run(run()), 0.5)
+        holder.join()
+
+    def test_stream_backpressure(self):
+        """
+        Test that a slow subscriber gets one resync frame instead of an
+        unbounded backlog, and that a change is encoded once for everyone.
+        """
+        async def run():
+            broadcaster = Broadcaster(queue_size=2)
+            slow = broadcaster.subscribe(["stock"])
+            others = [broadcaster.subscribe(["stock"]) for _ in range(3)]
+            for version in range(4):
+                broadcaster.publish("stock", "stock", {"version": version})
+            await asyncio.sleep(0)
+            backlog = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+            return backlog, others
+
+        backlog, others = asyncio.run(run())
+        self.assertEqual(len(backlog), 2)
+        self.assertTrue(backlog[0].startswith(b"event: resync"))
+        self.assertIn(b'"version":3', backlog[1])
+        self.assertIs(others[0].queue.get_nowait(), others[1].queue.get_nowait())
+
+    def test_idempotent_order_and_payment(self):
+        """
+        Test that requests repeated with an Idempotency-Key, even
+        concurrently, change state once and get the first response back.
+        """
+        key = {"Idempotency-Key": uuid.uuid4().hex}
+        order = [{"name": "Corona", "quantity": 1, "user": "Tony Stark"}]
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: client.post("/beers/order", json=order, headers=key), range(10)))
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(len({response.content for response in responses}), 1)
+        self.assertEqual(sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses), 9)
+        self.assertEqual(stock.beers[0].quantity, 4)
+        self.assertEqual(len(current_order.rounds), 1)
+
+        other = [{"name": "Corona", "quantity": 2, "user": "Tony Stark"}]
+        self.assertEqual(client.post("/beers/order", json=other, headers=key).status_code, 422)
+
+        short_key = {"Idempotency-Key": uuid.uuid4().hex}
+        too_many = [{"name": "Corona", "quantity": 50, "user": "Tony Stark"}]
+        for _ in range(2):
+            self.assertEqual(client.post("/beers/order", json=too_many, headers=short_key).status_code, 400)
+
+        pay_key = {"Idempotency-Key": uuid.uuid4().hex}
+        payment = {"mode": "individual", "friend": "Tony Stark"}
+        first = client.put("/beers/pay", json=payment, headers=pay_key)
+        second = client.put("/beers/pay", json=payment, headers=pay_key)
+        self.assertEqual(first.json(), second.json())
+        self.assertAlmostEqual(friends["Tony Stark"].balance, current_order.total)
+
+    def test_idempotency_cache_bounds(self):
+        """
+        Test that stored results are evicted by age and by count.
+        """
+        calls = []
+
+        def handler():
+            calls.append(1)
+            return json_response({"call": len(calls)})
+
+        cache = IdempotencyCache(ttl=60, max_keys=2)
+        for key in ("a", "b", "a", "c"):
+            cache.execute(key, "same", handler)
+        self.assertEqual((len(calls), list(cache.entries)), (3, ["b", "c"]))
+        cache.execute("a", "same", handler)
+        self.assertEqual(list(cache.entries), ["c", "a"])
+
+        expired = IdempotencyCache(ttl=0)
+        expired.execute("a", "same", handler)
+        expired.execute("a", "same", handler)
+        self.assertEqual(len(calls), 6)
+
     def test_place_order(self):
         """
         Test the order placement endpoint.
@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from main import app
+from models.orders import Beer, OrderItem, PaidModeEnum, PricingKindEnum, PricingRule
+from services.orders_service import current_order, default_tab, friends, stock, tabs
+from services.pricing import DEFAULT_RULES, PricingPlan, pricing_engine
+
+client = TestClient(app)
+
+
+def frozen(now: datetime):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+    return FrozenDatetime
+
+RULES = [
+    PricingRule(kind=PricingKindEnum.tax, name="VAT", rate=0.19),
+    PricingRule(kind=PricingKindEnum.volume, name="Volume", rate=0.10, min_quantity=4),
+    PricingRule(kind=PricingKindEnum.promo, name="Corona 3+", rate=0.20, beer="Corona", min_quantity=3),
+    PricingRule(kind=PricingKindEnum.happy_hour, name="Late", rate=0.50, start="22:00", end="02:00", days=[4, 5]),
+]
+
+
+class TestPricingPlan(unittest.TestCase):
+    def test_evaluate(self):
+        """
+        Test that taxes, the best volume tier, promotions and happy hours
+        add up, and that discounts are capped at the subtotal.
+        """
+        plan = PricingPlan(RULES)
+        items = [OrderItem(name="Corona", quantity=3, total=345), OrderItem(name="Quilmes", quantity=1, total=120)]
+        prices = plan.evaluate(items, {"Late": 120})
+        self.assertEqual(prices.subtotal, 46500)
+        self.assertEqual(prices.taxes, 8835)
+        self.assertEqual(
+            [(name, amount) for name, _, amount in prices.adjustments],
+            [("VAT", 8835), ("Volume", 4650), ("Corona 3+", 6900), ("Late", 6000)],
+        )
+        self.assertEqual(prices.discounts, 4650 + 6900 + 6000)
+        self.assertEqual(prices.label, "Volume, Corona 3+, Late")
+
+        generous = PricingPlan([PricingRule(kind=PricingKindEnum.volume, name="Free", rate=0.8),
+                                PricingRule(kind=PricingKindEnum.promo, name="Also free", rate=0.8, beer="Corona")])
+        self.assertEqual(generous.evaluate(items, {}).discounts, 46500)
+
+    def test_happy_hour_window(self):
+        """
+        Test windows that cross midnight and are limited to some weekdays.
+        """
+        plan = PricingPlan(RULES)
+        # 2026-10-16 is a Friday.
+        self.assertEqual(plan.happy_hour(datetime(2026, 10, 16, 23, 30)), "Late")
+        self.assertEqual(plan.happy_hour(datetime(2026, 10, 17, 1, 59)), "Late")
+        self.assertIsNone(plan.happy_hour(datetime(2026, 10, 17, 2, 0)))
+        self.assertIsNone(plan.happy_hour(datetime(2026, 10, 15, 23, 30)))
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            PricingPlan([PricingRule(kind=PricingKindEnum.promo, name="No beer", rate=0.1)])
+        with self.assertRaises(ValueError):
+            PricingPlan([DEFAULT_RULES[0], DEFAULT_RULES[0]])
+
+
+class TestPricingAPI(unittest.TestCase):
+    def setUp(self):
+        stock.beers = [
+            Beer(name="Corona", price=115, quantity=100),
+            Beer(name="Quilmes", price=120, quantity=100),
+        ]
+        stock.last_updated = None
+        current_order.items = []
+        current_order.rounds = []
+        current_order.subtotal = 0
+        current_order.total = 0
+        current_order.paid = False
+        current_order.paid_mode = PaidModeEnum.unknown
+        friends.clear()
+        default_tab.happy_hour.clear()
+        tabs.tabs.clear()
+        pricing_engine.load(RULES)
+
+    def tearDown(self):
+        default_tab.happy_hour.clear()
+        pricing_engine.load(DEFAULT_RULES)
+
+    def test_plan_is_cached_per_tab(self):
+        """
+        Test that totals are deterministic and that a tab is only evaluated
+        again when its order changes.
+        """
+        self.assertEqual(client.get("/beers/pricing/plan").json()["version"], pricing_engine.plan.version)
+        tab_id = client.post("/beers/tabs", json={}).json()["tab_id"]
+        order = [{"name": "Corona", "quantity": 3, "user": "Tony Stark"}, {"name": "Quilmes", "quantity": 1, "user": "Peter Parker"}]
+        client.post(f"/beers/tabs/{tab_id}/order", json=order)
+        pricing = client.get(f"/beers/tabs/{tab_id}/pricing").json()
+        self.assertEqual(pricing["evaluations"], 1)
+        self.assertEqual(pricing["discounts"], 46.5 + 69)
+        self.assertEqual(tabs.get(tab_id).order.total, pricing["total"])
+        self.assertEqual(client.get(f"/beers/tabs/{tab_id}/pricing").json()["evaluations"], 1)
+
+        client.post(f"/beers/tabs/{tab_id}/order", json=[{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}])
+        self.assertEqual(client.get(f"/beers/tabs/{tab_id}/pricing").json()["evaluations"], 2)
+        self.assertEqual(client.get("/beers/tabs/missing/pricing").status_code, 404)
+
+    def test_happy_hour_rounds(self):
+        """
+        Test that only the rounds received during a happy hour get its
+        discount, whatever time the client says they were created.
+        """
+        def batch(now, created):
+            round_request = {"items": [{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}], "created": created}
+            with patch("services.orders_service.datetime", frozen(now)):
+                client.post("/beers/order/batch", json={"rounds": [round_request]})
+
+        # 2026-10-16 is a Friday.
+        batch(datetime(2026, 10, 16, 23, 0), "2026-10-16T20:00:00")
+        batch(datetime(2026, 10, 16, 20, 0), "2026-10-16T23:00:00")
+        adjustments = {line["rule"]: line["amount"] for line in client.get("/beers/pricing").json()["adjustments"]}
+        self.assertEqual(adjustments, {"VAT": 45.6, "Late": 60})
+        self.assertEqual(current_order.discounts_str, "Late")
+        self.assertEqual([r.created.hour for r in current_order.rounds], [20, 23])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from models.orders import Beer, OrderRequest, PaidModeEnum
+from main import app
+from services.orders_service import stock, current_order, default_tab, friends, update_stock_and_order
+
+client = TestClient(app)
+
+
+class TestStockReservation(unittest.TestCase):
+    def setUp(self):
+        """
+        Reset data before each test to ensure isolation.
+        """
+        stock.beers = [
+            Beer(name="Corona", price=115, quantity=500),
+            Beer(name="Quilmes", price=120, quantity=300),
+            Beer(name="Club Colombia", price=110, quantity=0),
+        ]
+        current_order.items = []
+        current_order.rounds = []
+        default_tab.trimmed = 0
+        current_order.subtotal = 0
+        current_order.total = 0
+        current_order.paid = False
+        current_order.paid_mode = PaidModeEnum.unknown
+        friends.clear()
+
+    def test_failed_line_leaves_stock_untouched(self):
+        """
+        Test that a multi-line order is rejected as a whole.
+        """
+        response = client.post("/beers/order", json=[
+            {"name": "Corona", "quantity": 2, "user": "Tony Stark"},
+            {"name": "Club Colombia", "quantity": 1, "user": "Tony Stark"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stock.beers[0].quantity, 500)
+        self.assertEqual(current_order.rounds, [])
+
+    def test_concurrent_orders_never_oversell(self):
+        """
+        Test that thousands of concurrent orders never oversell or lose stock.
+        """
+        payloads = [
+            [{"name": "Corona", "quantity": 1, "user": f"Friend {i % 20}"}]
+            if i % 2 else
+            [
+                {"name": "Corona", "quantity": 1, "user": f"Friend {i % 20}"},
+                {"name": "Quilmes", "quantity": 1, "user": f"Friend {i % 20}"},
+            ]
+            for i in range(2000)
+        ]
+        with TestClient(app) as shared_client, ThreadPoolExecutor(max_workers=32) as pool:
+            statuses = list(pool.map(
+                lambda payload: shared_client.post("/beers/order", json=payload).status_code, payloads
+            ))
+
+        self.assertEqual(set(statuses), {200, 400})
+        ordered = {item.name: item.quantity for item in current_order.items}
+        self.assertEqual(stock.beers[0].quantity + ordered["Corona"], 500)
+        self.assertEqual(stock.beers[1].quantity + ordered["Quilmes"], 300)
+        self.assertEqual(stock.beers[0].quantity, 0)
+        self.assertGreaterEqual(stock.beers[1].quantity, 0)
+        self.assertEqual(default_tab.round_count, statuses.count(200))
+
+    def test_concurrent_service_calls(self):
+        """
+        Test the reservation layer directly under heavy thread contention.
+        """
+        def order(i):
+            try:
+                update_stock_and_order([
+                    OrderRequest(name="Quilmes", quantity=1, user=f"Friend {i % 7}"),
+                    OrderRequest(name="Corona", quantity=2, user=f"Friend {i % 5}"),
+                ])
+                return True
+            except Exception:
+                return False
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=64) as pool:
+                placed = sum(pool.map(order, range(5000)))
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(placed, 250)
+        self.assertEqual(stock.beers[0].quantity, 0)
+        self.assertEqual(stock.beers[1].quantity, 50)
+        self.assertEqual(current_order.subtotal, placed * (120 + 2 * 115))
+
+
+if __name__ == "__main__":
+    unittest.main()
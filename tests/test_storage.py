@@ -0,0 +1,241 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from fastapi import HTTPException
+from models.orders import Beer, OrderRequest, PaidModeEnum, PayRequest, Stock, StockItem, StockRequest
+from services import orders_service
+from services.stock_index import StockIndex
+from services.storage import SQLiteStorage, create_storage, InMemoryStorage
+
+
+# A worker process of the app, answering "[method, path, body]" lines on
+# stdin with "[status, body]" lines on stdout.
+WORKER = """
+import json, sys
+out, sys.stdout = sys.stdout, sys.stderr
+from fastapi.testclient import TestClient
+from main import app
+with TestClient(app) as client:
+    for line in sys.stdin:
+        method, path, body = json.loads(line)
+        response = client.request(method, path, json=body)
+        out.write(json.dumps([response.status_code, response.json()]) + "\\n")
+        out.flush()
+"""
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Worker:
+    def __init__(self, env: dict):
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", WORKER], cwd=ROOT, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+
+    def request(self, method: str, path: str, body=None):
+        self.process.stdin.write(json.dumps([method, path, body]) + "\n")
+        self.process.stdin.flush()
+        return json.loads(self.process.stdout.readline())
+
+    def stop(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=30)
+
+
+def new_stock_index():
+    return StockIndex(Stock(
+        last_updated=datetime.now(),
+        beers=[
+            Beer(name="Corona", price=115, quantity=5),
+            Beer(name="Quilmes", price=120, quantity=10),
+        ],
+    ))
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "orders.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_create_storage(self):
+        """
+        Test that the backend is chosen from the storage URL.
+        """
+        self.assertIsInstance(create_storage(new_stock_index(), "memory"), InMemoryStorage)
+        storage = create_storage(new_stock_index(), f"sqlite:///{self.path}")
+        self.assertIsInstance(storage, SQLiteStorage)
+        storage.close()
+
+    def test_workers_share_stock(self):
+        """
+        Test that two backends on the same file see each other's reservations.
+        """
+        first_index, second_index = new_stock_index(), new_stock_index()
+        first = SQLiteStorage(first_index, self.path)
+        second = SQLiteStorage(second_index, self.path)
+
+        self.assertEqual(first.reserve({"Corona": 4}), {"Corona": 115})
+        with self.assertRaises(HTTPException) as error:
+            second.reserve({"Quilmes": 1, "Corona": 2})
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(second.reserve({"Corona": 1}), {"Corona": 115})
+        self.assertEqual(second_index.get("Corona").quantity, 0)
+        self.assertEqual(second_index.get("Quilmes").quantity, 10)
+        self.assertEqual(first_index.get("Corona").quantity, 1)
+        self.assertTrue(first.refresh_stock())
+        self.assertEqual(first_index.get("Corona").quantity, 0)
+        self.assertFalse(first.refresh_stock())
+
+        with self.assertRaises(HTTPException):
+            second.fill([StockItem(name="Corona", quantity=-5)])
+        self.assertEqual(second_index.get("Corona").quantity, 0)
+        second.fill([StockItem(name="Aguila", quantity=3, price=100)])
+        second.fill([StockItem(name="Aguila", quantity=1, price=1)])
+        reopened = new_stock_index()
+        SQLiteStorage(reopened, self.path).close()
+        self.assertEqual((reopened.get("Aguila").quantity, reopened.get("Aguila").price), (4, 100))
+        self.assertEqual(reopened.get("Corona").quantity, 0)
+        first.close()
+        second.close()
+
+    def test_restore_rebuilds_tabs(self):
+        """
+        Test that rounds and payments are replayed after a restart.
+        """
+        storage = SQLiteStorage(orders_service.stock_index, self.path)
+        with patch.object(orders_service, "storage", storage):
+            tab = orders_service.tabs.create()
+            orders_service.update_stock_and_order([
+                OrderRequest(name="Corona", quantity=1, user="Tony Stark"),
+                OrderRequest(name="Quilmes", quantity=2, user="Peter Parker"),
+            ], tab)
+            orders_service.pay_bill(PayRequest(mode="individual", friend="Tony Stark"), tab)
+            balance = tab.friends["Tony Stark"].balance
+            storage.close()
+
+            orders_service.tabs.tabs.clear()
+            restarted = SQLiteStorage(orders_service.stock_index, self.path)
+            with patch.object(orders_service, "storage", restarted):
+                orders_service.restore()
+            restarted.close()
+
+        restored = orders_service.tabs.get(tab.tab_id)
+        self.assertEqual(restored.order.subtotal, 115 + 240)
+        self.assertEqual(len(restored.order.rounds), 1)
+        self.assertEqual(restored.order.paid_mode, PaidModeEnum.individual)
+        self.assertAlmostEqual(restored.friends["Tony Stark"].balance, balance)
+        orders_service.tabs.tabs.clear()
+
+    def test_snapshot_keeps_events_it_does_not_cover(self):
+        """
+        Test that a snapshot only archives the events up to the one it was
+        taken at, and that later readers still find the archived ones.
+        """
+        storage = SQLiteStorage(new_stock_index(), self.path)
+        storage.record_payment("tab", PaidModeEnum.equal.value, {"Tony Stark": 10})
+        storage.record_payment("tab", PaidModeEnum.equal.value, {"Tony Stark": 5})
+        self.assertEqual(storage.last_event_id(), 2)
+        storage.save_snapshot("tab", {"paid": 10}, 1)
+        self.assertEqual([event["id"] for event in storage.load_events()], [2])
+        self.assertEqual([event["id"] for event in storage.events_since(0)], [1, 2])
+        self.assertEqual([event["id"] for event in storage.events_since(1)], [2])
+        self.assertEqual(len(storage.history("tab")), 2)
+        storage.close()
+
+    def test_workers_share_tabs(self):
+        """
+        Test that two worker processes on one database serve the same tabs,
+        and that snapshots taken by either never drop the other's rounds.
+        """
+        env = dict(
+            os.environ,
+            ORDERS_STORAGE=f"sqlite:///{self.path}",
+            ORDERS_SNAPSHOT_EVERY="3",
+            LOG_FILE=os.path.join(self.directory.name, "workers.log"),
+        )
+        first, second = Worker(env), Worker(env)
+        try:
+            self.assertEqual(first.request("POST", "/beers/tabs", {"tab_id": "shared"})[0], 201)
+            self.assertEqual(second.request("POST", "/beers/tabs", {"tab_id": "shared"})[0], 409)
+            order = [{"name": "Quilmes", "quantity": 1, "user": "Tony Stark"}]
+            for worker in (first, second, first, second, first):
+                self.assertEqual(worker.request("POST", "/beers/tabs/shared/order", order)[0], 200)
+            status, bill = second.request("GET", "/beers/tabs/shared/bill")
+            self.assertEqual((len(bill["rounds"]), bill["subtotal"]), (5, 600))
+            beers = {beer["name"]: beer for beer in first.request("GET", "/beers/stock")[1]["beers"]}
+            self.assertEqual(beers["Quilmes"]["quantity"], 5)
+
+            self.assertEqual(second.request("PUT", "/beers/tabs/shared/pay", {"mode": "equal"})[0], 200)
+            self.assertTrue(first.request("GET", "/beers/tabs/shared/bill")[1]["paid"])
+        finally:
+            first.stop()
+            second.stop()
+
+        restarted = Worker(env)
+        try:
+            status, bill = restarted.request("GET", "/beers/tabs/shared/bill")
+            self.assertEqual((len(bill["rounds"]), bill["subtotal"], bill["paid"]), (5, 600, True))
+            self.assertEqual(
+                [event["kind"] for event in restarted.request("GET", "/beers/tabs/shared/history")[1]["events"]],
+                ["open"] + ["round"] * 5 + ["payment"],
+            )
+            beers = {beer["name"]: beer for beer in restarted.request("GET", "/beers/stock")[1]["beers"]}
+            self.assertEqual(beers["Quilmes"]["quantity"], 5)
+        finally:
+            restarted.stop()
+
+    def test_snapshots_compaction_and_history(self):
+        """
+        Test that tabs are restored from a snapshot plus the events after it,
+        that the live order is trimmed only when a snapshot journals the
+        trimmed rounds and that closed tabs move to the history.
+        """
+        storage = SQLiteStorage(orders_service.stock_index, self.path)
+        with patch.object(orders_service, "storage", storage), \
+                patch.object(orders_service, "SNAPSHOT_EVERY", 3), \
+                patch.object(orders_service, "LIVE_ROUNDS", 2):
+            orders_service.fill_stock(StockRequest(items=[StockItem(name="Quilmes", quantity=10)]))
+            tab = orders_service.tabs.create()
+            for _ in range(4):
+                orders_service.update_stock_and_order([OrderRequest(name="Quilmes", quantity=1, user="Tony Stark")], tab)
+            orders_service.pay_bill(PayRequest(mode="individual", friend="Tony Stark"), tab)
+            self.assertEqual((tab.round_count, len(tab.order.rounds)), (4, 3))
+            total, balance = tab.order.total, tab.friends["Tony Stark"].balance
+            storage.close()
+
+            orders_service.tabs.tabs.clear()
+            restarted = SQLiteStorage(orders_service.stock_index, self.path)
+            self.assertIn(tab.tab_id, restarted.load_snapshots())
+            self.assertEqual([event["kind"] for event in restarted.load_events()], ["round", "payment"])
+            with patch.object(orders_service, "storage", restarted):
+                orders_service.restore()
+                restored = orders_service.tabs.get(tab.tab_id)
+                self.assertEqual((restored.round_count, len(restored.order.rounds)), (4, 3))
+                self.assertEqual(restored.order.subtotal, 4 * 120)
+                self.assertEqual(restored.order.total, total)
+                self.assertTrue(restored.order.paid)
+                self.assertAlmostEqual(restored.friends["Tony Stark"].balance, balance)
+                self.assertEqual(restored.ledger.consumed("Tony Stark"), 4 * 120)
+                self.assertEqual(
+                    [event["kind"] for event in orders_service.tab_history(tab.tab_id)],
+                    ["round"] * 4 + ["payment"],
+                )
+
+                orders_service.close_tab(tab.tab_id)
+                self.assertEqual(orders_service.tab_history(tab.tab_id)[-1]["kind"], "close")
+                self.assertEqual(restarted.load_events(), [])
+                self.assertEqual(restarted.load_snapshots(), {})
+            restarted.close()
+        orders_service.tabs.tabs.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()